@@ -1,14 +1,23 @@
 __version__ = "0.1.1"
 
-from .core.auth_manager import AuthNexus
-from .core.webauthn import WebAuthnManager
-from .core.security_monitor import SecurityMonitor, SecurityConfig
+import importlib
+import logging
+
 from .exceptions import (
     InvalidTokenError,
     SecurityThresholdExceeded,
     CredentialVerificationError
 )
 
+# Heavy submodules (PyJWT, pydantic, webauthn, cryptography) are imported on
+# first attribute access so token-only services keep a cheap cold start
+_LAZY_ATTRS = {
+    'AuthNexus': '.core.auth_manager',
+    'WebAuthnManager': '.core.webauthn',
+    'SecurityMonitor': '.core.security_monitor',
+    'SecurityConfig': '.core.security_monitor',
+}
+
 # Public API
 __all__ = [
     'AuthNexus',
@@ -20,11 +29,21 @@ __all__ = [
     'CredentialVerificationError'
 ]
 
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
+
 # Initialize package logging
-import logging
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
 def init_app(app):
     """Professional Flask extension initialization shortcut"""
-    from .integrations.flask import AuthNexusFlask
+    from .integerations.flask import AuthNexusFlask
     return AuthNexusFlask(app)
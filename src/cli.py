@@ -0,0 +1,68 @@
+import os
+import sys
+import signal
+import asyncio
+import logging
+import argparse
+from typing import List, Optional
+from .core.verifier_daemon import default_socket_path
+
+logger = logging.getLogger(__name__)
+
+async def _run_daemon(daemon) -> None:
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    await daemon.start()
+    try:
+        await stopped.wait()
+    finally:
+        await daemon.close()
+
+def _serve(args: argparse.Namespace) -> int:
+    secret = os.getenv(args.secret_env)
+    if not secret:
+        print(f"authnexus-cli: set {args.secret_env} to the token signing secret", file=sys.stderr)
+        return 2
+
+    from .core.auth_manager import AuthNexus, AuthConfig
+    from .core.security_monitor import SecurityMonitor
+    from .core.verifier_daemon import VerifierDaemon
+
+    # One monitor serves both the daemon's risk requests and AuthNexus's own checks
+    monitor = SecurityMonitor()
+    daemon = VerifierDaemon(
+        AuthNexus(AuthConfig(secret_key=secret, algorithm=args.algorithm), security_monitor=monitor),
+        security_monitor=monitor,
+        socket_path=args.socket
+    )
+    writer = monitor.start_checkpointing() if monitor.config.snapshot_path else None
+    try:
+        asyncio.run(_run_daemon(daemon))
+    finally:
+        if writer is not None:
+            writer.stop()
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="authnexus-cli", description="AuthNexus command line tools")
+    parser.add_argument("--log-level", default="INFO")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Run a shared token verification daemon on a Unix socket")
+    serve.add_argument("--socket", default=default_socket_path(), help="Unix socket path to listen on")
+    serve.add_argument("--algorithm", default="HS256")
+    serve.add_argument(
+        "--secret-env",
+        default="AUTH_SECRET",
+        help="Environment variable holding the signing secret"
+    )
+    serve.set_defaults(handler=_serve)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    return args.handler(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
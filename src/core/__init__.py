@@ -0,0 +1,23 @@
+import importlib
+
+_LAZY_ATTRS = {
+    'AuthNexus': '.auth_manager',
+    'AuthConfig': '.auth_manager',
+    'SecurityMonitor': '.security_monitor',
+    'SecurityConfig': '.security_monitor',
+    'WebAuthnManager': '.webauthn',
+    'WebAuthnConfig': '.webauthn',
+}
+
+__all__ = list(_LAZY_ATTRS)
+
+def __getattr__(name):
+    module = _LAZY_ATTRS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRS))
@@ -1,50 +1,108 @@
+import time
+from functools import cached_property
 from typing import Optional
 from pydantic import BaseModel
 import jwt
-from datetime import datetime, timedelta
+from ..exceptions import SecurityThresholdExceeded
+from .refresh_tokens import RefreshTokenManager, RefreshTokenStore
+from .security_monitor import SecurityMonitor
+from .token_verifier import FastTokenVerifier
 
 class AuthConfig(BaseModel):
     secret_key: str
     algorithm: str = "HS256"
     token_expiry: int = 3600  # 1 hour
     webauthn_timeout: int = 300  # 5 minutes
+    refresh_token_expiry: int = 1209600  # 14 days
 
 class AuthNexus:
-    def __init__(self, config: AuthConfig):
+    def __init__(
+        self,
+        config: AuthConfig,
+        refresh_store: Optional[RefreshTokenStore] = None,
+        security_monitor: Optional[SecurityMonitor] = None
+    ):
         self.config = config
-        self.security_monitor = SecurityMonitor()
+        # Request risk scoring and event log shared with the framework adapters
+        self.security_monitor = security_monitor or SecurityMonitor()
+        self.token_anomalies = TokenAnomalyDetector()
+        self.refresh_tokens = RefreshTokenManager(
+            store=refresh_store,
+            expiry=config.refresh_token_expiry
+        )
+        self._fast_verifier = (
+            FastTokenVerifier(config.secret_key, config.algorithm)
+            if FastTokenVerifier.supports(config.algorithm) else None
+        )
 
     def create_token(self, user_id: str, metadata: dict) -> str:
         """JWT token generation with security checks"""
         payload = {
             "sub": user_id,
-            "exp": datetime.utcnow() + timedelta(seconds=self.config.token_expiry),
+            "exp": int(time.time()) + self.config.token_expiry,
             "iss": "authnexus",
             **metadata
         }
-        return jwt.encode(payload, self.config.secret_key, algorithm=self.config.algorithm)
+        return jwt.encode(payload, self._signing_key, algorithm=self.config.algorithm)
 
     def verify_token(self, token: str) -> Optional[dict]:
         """Secure token verification with anomaly detection"""
-        try:
-            payload = jwt.decode(
-                token,
-                self.config.secret_key,
-                algorithms=[self.config.algorithm]
-            )
-            
-            if self.security_monitor.check_anomalies(payload):
-                raise SecurityException("Suspicious token activity")
-                
-            return payload
-        except jwt.PyJWTError:
-            return None
-
-class SecurityMonitor:
+        if self._fast_verifier is not None:
+            payload = self._fast_verifier.verify(token)
+            if payload is None:
+                return None
+        else:
+            try:
+                payload = jwt.decode(
+                    token,
+                    self._verification_key,
+                    algorithms=[self.config.algorithm],
+                    issuer="authnexus",
+                    options={"require": ["exp", "iss"]}
+                )
+            except jwt.PyJWTError:
+                return None
+
+        if self.token_anomalies.check_anomalies(payload):
+            raise SecurityThresholdExceeded("Suspicious token activity")
+
+        return payload
+
+    @cached_property
+    def _signing_key(self):
+        """Parse the configured key once, on first use rather than per token"""
+        algorithm = jwt.get_algorithm_by_name(self.config.algorithm)
+        return algorithm.prepare_key(self.config.secret_key)
+
+    @cached_property
+    def _verification_key(self):
+        key = self._signing_key
+        # Asymmetric algorithms are configured with a private key; verify with its public half
+        return key.public_key() if hasattr(key, "public_key") else key
+
+    def create_refresh_token(self, user_id: str, metadata: Optional[dict] = None) -> str:
+        """Opaque refresh token starting a new rotation family"""
+        return self.refresh_tokens.issue(user_id, metadata)
+
+    def refresh(self, refresh_token: str) -> dict:
+        """Rotate a refresh token into a fresh access/refresh token pair"""
+        successor, record = self.refresh_tokens.rotate(refresh_token)
+        return {
+            "access_token": self.create_token(record.user_id, record.metadata),
+            "refresh_token": successor
+        }
+
+    def revoke_refresh_token(self, refresh_token: str) -> int:
+        """Revoke the whole family a refresh token belongs to"""
+        return self.refresh_tokens.revoke(refresh_token)
+
+class TokenAnomalyDetector:
+    """Hook for rejecting verified token payloads; request risk lives in SecurityMonitor"""
+
     def check_anomalies(self, payload: dict) -> bool:
-        """Basic anomaly detection (extend for enterprise use)"""
-        if payload.get('iss') != 'authnexus':
-            return True
-        if datetime.utcfromtimestamp(payload['exp']) < datetime.utcnow():
-            return True
+        """Basic anomaly detection (extend for enterprise use)
+
+        Issuer and expiry are already enforced during verification, so the
+        default hook has nothing left to reject.
+        """
         return False
@@ -0,0 +1,102 @@
+import math
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional, Tuple
+
+EARTH_RADIUS_KM = 6371.0
+
+class GeoLocation(NamedTuple):
+    latitude: float
+    longitude: float
+    country: Optional[str] = None
+
+class GeoIPResolver:
+    """Resolves client IPs against a local MaxMind-format database opened via mmap
+
+    The memory map is shared through the OS page cache by every process on the
+    host. A bounded LRU of recent results keeps memory independent of the
+    number of distinct IPs seen.
+    """
+
+    def __init__(
+        self,
+        database_path: Optional[str] = None,
+        cache_size: int = 4096,
+        reader=None
+    ):
+        if reader is None:
+            try:
+                import maxminddb
+            except ImportError as e:
+                raise ImportError(
+                    "GeoIP scoring requires maxminddb: pip install authnexus[geoip]"
+                ) from e
+            try:
+                reader = maxminddb.open_database(database_path, mode=maxminddb.MODE_MMAP_EXT)
+            except ValueError:
+                # C extension unavailable; the pure-Python reader still uses mmap
+                reader = maxminddb.open_database(database_path, mode=maxminddb.MODE_MMAP)
+        self._reader = reader
+        self._cache: "OrderedDict[str, Optional[GeoLocation]]" = OrderedDict()
+        self._cache_size = cache_size
+
+    def lookup(self, ip: str) -> Optional[GeoLocation]:
+        cache = self._cache
+        try:
+            location = cache[ip]
+            cache.move_to_end(ip)
+            return location
+        except KeyError:
+            pass
+
+        location = self._resolve(ip)
+        cache[ip] = location
+        if len(cache) > self._cache_size:
+            try:
+                cache.popitem(last=False)
+            except KeyError:
+                pass
+        return location
+
+    def _resolve(self, ip: str) -> Optional[GeoLocation]:
+        try:
+            record = self._reader.get(ip)
+        except ValueError:
+            return None
+        if not record:
+            return None
+        location = record.get("location") or {}
+        latitude = location.get("latitude")
+        longitude = location.get("longitude")
+        if latitude is None or longitude is None:
+            return None
+        return GeoLocation(latitude, longitude, (record.get("country") or {}).get("iso_code"))
+
+    def close(self) -> None:
+        self._reader.close()
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def max_travel_speed(
+    history: Iterable[Tuple[float, float, float]],
+    current: GeoLocation,
+    now: float,
+    min_distance_km: float = 100.0,
+    min_elapsed: float = 60.0
+) -> float:
+    """Highest implied speed (km/h) between recent locations and the current one
+
+    Jumps shorter than ``min_distance_km`` are ignored to absorb GeoIP imprecision.
+    """
+    fastest = 0.0
+    for latitude, longitude, timestamp in history:
+        distance = haversine_km(latitude, longitude, current.latitude, current.longitude)
+        if distance < min_distance_km:
+            continue
+        hours = max(now - timestamp, min_elapsed) / 3600.0
+        fastest = max(fastest, distance / hours)
+    return fastest
@@ -0,0 +1,123 @@
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Dict, Iterator, Optional, Tuple
+
+# Reference counters saturate here, so a hot profile survives at most this many sweeps
+_MAX_REFERENCES = 3
+
+class ProfileCache(MutableMapping):
+    """Risk profiles bounded by a second-chance CLOCK policy
+
+    Entries sit in insertion order and the front of the order is the clock
+    hand. A lookup only bumps a small saturating counter. When the cache is
+    full, the hand evicts the first unprotected entry that is either idle
+    past ``idle_ttl`` with no failures or has no references left. Each entry
+    the hand passes loses one reference and moves to the back.
+
+    Profiles with at least ``protected_min_failures`` failures inside
+    ``protection_window`` are protected, so flooding the monitor with new
+    clients cannot reset an attacker's lockout state. If the hand finds no
+    victim within ``scan_limit`` entries, it evicts the weakest entry it
+    passed: an unprotected one if any, else the protected profile with the
+    fewest failures, oldest first. The cap therefore always holds.
+    """
+
+    def __init__(
+        self,
+        max_profiles: Optional[int] = None,
+        idle_ttl: float = 3600,
+        protection_window: float = 3600,
+        protected_min_failures: int = 2,
+        scan_limit: int = 32
+    ):
+        self.max_profiles = max_profiles
+        self.idle_ttl = idle_ttl
+        self.protection_window = protection_window
+        self.protected_min_failures = protected_min_failures
+        self.scan_limit = max(scan_limit, 1)
+        self._profiles: "OrderedDict[str, object]" = OrderedDict()
+        self._references: Dict[str, int] = {}
+        self.stats = {"evicted_idle": 0, "evicted_cold": 0, "evicted_protected": 0, "protected_skips": 0}
+
+    def __getitem__(self, key: str):
+        profile = self._profiles[key]
+        if self.max_profiles is not None:
+            references = self._references
+            count = references.get(key, 0)
+            if count < _MAX_REFERENCES:
+                references[key] = count + 1
+        return profile
+
+    def __setitem__(self, key: str, profile) -> None:
+        if self.max_profiles is not None and key not in self._profiles:
+            while self._profiles and len(self._profiles) >= self.max_profiles:
+                self._evict(time.time())
+        self._profiles[key] = profile
+
+    def __delitem__(self, key: str) -> None:
+        self._discard(key)
+
+    def __contains__(self, key) -> bool:
+        return key in self._profiles
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._profiles)
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def items(self):
+        # Bulk reads (reports, snapshots) must not count as references
+        return self._profiles.items()
+
+    def values(self):
+        return self._profiles.values()
+
+    @staticmethod
+    def _last_seen(profile) -> float:
+        locations = profile.locations
+        return max(profile.last_attempt, locations[-1][2]) if locations else profile.last_attempt
+
+    def _evict(self, now: float) -> None:
+        profiles, references = self._profiles, self._references
+        fallback: Optional[str] = None
+        weakest: Optional[Tuple[int, float, str]] = None
+
+        for _ in range(min(self.scan_limit, len(profiles))):
+            key = next(iter(profiles))
+            profile = profiles[key]
+            last_seen = self._last_seen(profile)
+            idle = now - last_seen
+
+            if profile.failed_attempts >= self.protected_min_failures and idle < self.protection_window:
+                self.stats["protected_skips"] += 1
+                rank = (profile.failed_attempts, last_seen, key)
+                if weakest is None or rank < weakest:
+                    weakest = rank
+                profiles.move_to_end(key)
+                continue
+            if not profile.failed_attempts and idle >= self.idle_ttl:
+                self.stats["evicted_idle"] += 1
+            else:
+                count = references.get(key, 0)
+                if count:
+                    references[key] = count - 1
+                    profiles.move_to_end(key)
+                    if fallback is None:
+                        fallback = key
+                    continue
+                self.stats["evicted_cold"] += 1
+            self._discard(key)
+            return
+
+        if fallback is not None:
+            self.stats["evicted_cold"] += 1
+            self._discard(fallback)
+        else:
+            self.stats["evicted_protected"] += 1
+            self._discard(weakest[2])
+
+    def _discard(self, key: str) -> None:
+        del self._profiles[key]
+        self._references.pop(key, None)
@@ -0,0 +1,330 @@
+import json
+import time
+import heapq
+import hashlib
+import secrets
+import logging
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, Optional, Set, List, Tuple
+from pydantic import BaseModel
+from ..exceptions import InvalidTokenError, TokenReuseDetected
+
+logger = logging.getLogger(__name__)
+
+class RefreshTokenRecord(BaseModel):
+    token_hash: str
+    family_id: str
+    user_id: str
+    metadata: dict = {}
+    issued_at: float
+    expires_at: float
+    used: bool = False
+
+def hash_refresh_token(token: str) -> str:
+    """Stores only ever see the SHA-256 digest of an opaque token"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+class RefreshTokenStore(ABC):
+    """Storage backend interface for refresh token records"""
+
+    @abstractmethod
+    def save(self, record: RefreshTokenRecord) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get(self, token_hash: str) -> Optional[RefreshTokenRecord]:
+        """Return the live record for a token hash, or None if unknown or expired"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def mark_used(self, token_hash: str) -> bool:
+        """Atomically consume a token; False if it was already used or is gone"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def revoke_family(self, family_id: str) -> int:
+        """Delete every token of a family, returning how many were removed"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        return 0
+
+class InMemoryRefreshTokenStore(RefreshTokenStore):
+    """Process-local store indexed by token hash and family with heap-based expiry"""
+
+    def __init__(self):
+        self._records: Dict[str, RefreshTokenRecord] = {}
+        self._families: Dict[str, Set[str]] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+
+    def save(self, record: RefreshTokenRecord) -> None:
+        with self._lock:
+            self._purge_locked(time.time())
+            self._records[record.token_hash] = record
+            self._families.setdefault(record.family_id, set()).add(record.token_hash)
+            heapq.heappush(self._expiry_heap, (record.expires_at, record.token_hash))
+
+    def get(self, token_hash: str) -> Optional[RefreshTokenRecord]:
+        record = self._records.get(token_hash)
+        if record is None or record.expires_at <= time.time():
+            return None
+        return record
+
+    def mark_used(self, token_hash: str) -> bool:
+        with self._lock:
+            record = self._records.get(token_hash)
+            if record is None or record.used or record.expires_at <= time.time():
+                return False
+            record.used = True
+            return True
+
+    def revoke_family(self, family_id: str) -> int:
+        with self._lock:
+            hashes = self._families.pop(family_id, set())
+            for token_hash in hashes:
+                self._records.pop(token_hash, None)
+            return len(hashes)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_locked(time.time())
+
+    def _purge_locked(self, now: float) -> int:
+        purged = 0
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, token_hash = heapq.heappop(self._expiry_heap)
+            record = self._records.pop(token_hash, None)
+            if record is None:
+                continue
+            family = self._families.get(record.family_id)
+            if family is not None:
+                family.discard(token_hash)
+                if not family:
+                    del self._families[record.family_id]
+            purged += 1
+        return purged
+
+class SQLiteRefreshTokenStore(RefreshTokenStore):
+    """Durable single-host store backed by an indexed SQLite table
+
+    Expired rows are deleted every ``purge_interval`` saves, so rotation
+    does not grow the table without bound.
+    """
+
+    def __init__(self, path: str = ":memory:", purge_interval: int = 1000):
+        import sqlite3
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._purge_interval = max(purge_interval, 1)
+        self._saves = 0
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS refresh_tokens ("
+                " token_hash TEXT PRIMARY KEY,"
+                " family_id TEXT NOT NULL,"
+                " user_id TEXT NOT NULL,"
+                " metadata TEXT NOT NULL,"
+                " issued_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " used INTEGER NOT NULL DEFAULT 0)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_family ON refresh_tokens (family_id)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_refresh_tokens_expiry ON refresh_tokens (expires_at)"
+            )
+
+    def save(self, record: RefreshTokenRecord) -> None:
+        with self._lock:
+            self._saves += 1
+            if self._saves % self._purge_interval == 0:
+                self._purge_locked(time.time())
+            self._conn.execute(
+                "INSERT OR REPLACE INTO refresh_tokens VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    record.token_hash,
+                    record.family_id,
+                    record.user_id,
+                    json.dumps(record.metadata),
+                    record.issued_at,
+                    record.expires_at,
+                    int(record.used)
+                )
+            )
+
+    def get(self, token_hash: str) -> Optional[RefreshTokenRecord]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT token_hash, family_id, user_id, metadata, issued_at, expires_at, used"
+                " FROM refresh_tokens WHERE token_hash = ? AND expires_at > ?",
+                (token_hash, time.time())
+            ).fetchone()
+        if row is None:
+            return None
+        return RefreshTokenRecord(
+            token_hash=row[0],
+            family_id=row[1],
+            user_id=row[2],
+            metadata=json.loads(row[3]),
+            issued_at=row[4],
+            expires_at=row[5],
+            used=bool(row[6])
+        )
+
+    def mark_used(self, token_hash: str) -> bool:
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE refresh_tokens SET used = 1"
+                " WHERE token_hash = ? AND used = 0 AND expires_at > ?",
+                (token_hash, time.time())
+            )
+            return cursor.rowcount == 1
+
+    def revoke_family(self, family_id: str) -> int:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM refresh_tokens WHERE family_id = ?", (family_id,)
+            )
+            return cursor.rowcount
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            return self._purge_locked(time.time())
+
+    def _purge_locked(self, now: float) -> int:
+        cursor = self._conn.execute(
+            "DELETE FROM refresh_tokens WHERE expires_at <= ?", (now,)
+        )
+        return cursor.rowcount
+
+class RedisRefreshTokenStore(RefreshTokenStore):
+    """Shared store for multi-host deployments; expiry is delegated to Redis TTLs"""
+
+    # Consume only tokens that still exist so an expired key is never recreated
+    _MARK_USED_SCRIPT = (
+        "if redis.call('EXISTS', KEYS[1]) == 1 then "
+        "return redis.call('HSETNX', KEYS[1], 'used', '1') end "
+        "return 0"
+    )
+
+    def __init__(self, client, prefix: str = "authnexus:rt"):
+        self._client = client
+        self._prefix = prefix
+        self._mark_used = client.register_script(self._MARK_USED_SCRIPT)
+
+    def _token_key(self, token_hash: str) -> str:
+        return f"{self._prefix}:token:{token_hash}"
+
+    def _family_key(self, family_id: str) -> str:
+        return f"{self._prefix}:family:{family_id}"
+
+    def save(self, record: RefreshTokenRecord) -> None:
+        token_key = self._token_key(record.token_hash)
+        family_key = self._family_key(record.family_id)
+        mapping = {
+            "family_id": record.family_id,
+            "user_id": record.user_id,
+            "metadata": json.dumps(record.metadata),
+            "issued_at": repr(record.issued_at),
+            "expires_at": repr(record.expires_at)
+        }
+        if record.used:
+            mapping["used"] = "1"
+
+        pipe = self._client.pipeline()
+        pipe.hset(token_key, mapping=mapping)
+        pipe.expireat(token_key, int(record.expires_at) + 1)
+        pipe.sadd(family_key, record.token_hash)
+        # Family index lives as long as its newest member
+        pipe.expireat(family_key, int(record.expires_at) + 1)
+        pipe.execute()
+
+    def get(self, token_hash: str) -> Optional[RefreshTokenRecord]:
+        data = self._client.hgetall(self._token_key(token_hash))
+        if not data:
+            return None
+        data = {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in data.items()
+        }
+        expires_at = float(data["expires_at"])
+        if expires_at <= time.time():
+            return None
+        return RefreshTokenRecord(
+            token_hash=token_hash,
+            family_id=data["family_id"],
+            user_id=data["user_id"],
+            metadata=json.loads(data["metadata"]),
+            issued_at=float(data["issued_at"]),
+            expires_at=expires_at,
+            used="used" in data
+        )
+
+    def mark_used(self, token_hash: str) -> bool:
+        return bool(self._mark_used(keys=[self._token_key(token_hash)]))
+
+    def revoke_family(self, family_id: str) -> int:
+        family_key = self._family_key(family_id)
+        members = self._client.smembers(family_key)
+        keys = [
+            self._token_key(m.decode() if isinstance(m, bytes) else m)
+            for m in members
+        ]
+        removed = self._client.delete(*keys) if keys else 0
+        self._client.delete(family_key)
+        return removed
+
+class RefreshTokenManager:
+    """Opaque refresh tokens with rotation on use and family-wide reuse revocation"""
+
+    def __init__(self, store: Optional[RefreshTokenStore] = None, expiry: int = 1209600):
+        self.store = store or InMemoryRefreshTokenStore()
+        self.expiry = expiry
+
+    def issue(
+        self,
+        user_id: str,
+        metadata: Optional[dict] = None,
+        family_id: Optional[str] = None
+    ) -> str:
+        """Issue a new refresh token, starting a new family unless one is given"""
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        self.store.save(RefreshTokenRecord(
+            token_hash=hash_refresh_token(token),
+            family_id=family_id or secrets.token_hex(16),
+            user_id=user_id,
+            metadata=metadata or {},
+            issued_at=now,
+            expires_at=now + self.expiry
+        ))
+        return token
+
+    def rotate(self, token: str) -> Tuple[str, RefreshTokenRecord]:
+        """Consume a refresh token and return its successor with the consumed record"""
+        token_hash = hash_refresh_token(token)
+        record = self.store.get(token_hash)
+        if record is None:
+            raise InvalidTokenError("Unknown or expired refresh token")
+
+        if record.used or not self.store.mark_used(token_hash):
+            revoked = self.store.revoke_family(record.family_id)
+            logger.warning(
+                f"Refresh token reuse detected for user {record.user_id}; "
+                f"revoked family {record.family_id} ({revoked} tokens)"
+            )
+            raise TokenReuseDetected("Refresh token reuse detected")
+
+        successor = self.issue(record.user_id, record.metadata, family_id=record.family_id)
+        return successor, record
+
+    def revoke(self, token: str) -> int:
+        """Revoke the entire family of the given refresh token"""
+        record = self.store.get(hash_refresh_token(token))
+        if record is None:
+            return 0
+        return self.store.revoke_family(record.family_id)
@@ -0,0 +1,294 @@
+import os
+import re
+import json
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+from .geoip import max_travel_speed
+
+logger = logging.getLogger(__name__)
+
+class RiskContext:
+    """Per-request inputs shared by every rule of one evaluation"""
+
+    __slots__ = (
+        "monitor",
+        "client_ip",
+        "user_agent",
+        "user_id",
+        "failed_attempts",
+        "last_attempt",
+        "now",
+    )
+
+    def __init__(
+        self,
+        monitor,
+        client_ip: str,
+        user_agent: str,
+        failed_attempts: int,
+        last_attempt: float,
+        now: float,
+        user_id: Optional[str] = None
+    ):
+        self.monitor = monitor
+        self.client_ip = client_ip
+        self.user_agent = user_agent or ""
+        self.user_id = user_id
+        self.failed_attempts = failed_attempts
+        self.last_attempt = last_attempt
+        self.now = now
+
+RuleEvaluator = Callable[[RiskContext], float]
+RuleCompiler = Callable[[dict, object], RuleEvaluator]
+
+RULE_COMPILERS: Dict[str, RuleCompiler] = {}
+
+def register_rule(rule_type: str):
+    """Register a compiler turning a policy rule spec into an evaluator closure"""
+    def decorator(compiler: RuleCompiler) -> RuleCompiler:
+        RULE_COMPILERS[rule_type] = compiler
+        return compiler
+    return decorator
+
+DEFAULT_POLICY = {
+    "rules": [
+        {"type": "failed_attempts", "weight": 0.4},
+        {"type": "velocity", "weight": 0.3},
+        {"type": "user_agent", "weight": 0.2, "patterns": ["bot"]},
+        {"type": "impossible_travel", "weight": 0.3},
+        # distinct_users_per_ip, distinct_ips_per_user and failure_rate are
+        # opt-in: enable them in a policy file once the sketches are sized
+        # for the deployment's traffic
+    ]
+}
+
+def _above_noise(sketch, key: str, now: float, limit: float) -> bool:
+    # A sketch cell also holds whatever collided into it, so the key's own
+    # signal is what remains after the expected collision share
+    return sketch.estimate(key, now) - sketch.noise_floor(now) >= limit
+
+@register_rule("failed_attempts")
+def _compile_failed_attempts(spec: dict, config) -> RuleEvaluator:
+    weight = float(spec["weight"])
+    limit = float(spec.get("max_failed_attempts", config.max_failed_attempts))
+
+    def evaluate(ctx: RiskContext) -> float:
+        return min(ctx.failed_attempts / limit, 1.0) * weight
+    return evaluate
+
+@register_rule("velocity")
+def _compile_velocity(spec: dict, config) -> RuleEvaluator:
+    weight = float(spec["weight"])
+    window = float(spec.get("window", config.ip_velocity_window))
+
+    def evaluate(ctx: RiskContext) -> float:
+        return weight if ctx.now - ctx.last_attempt < window else 0.0
+    return evaluate
+
+@register_rule("user_agent")
+def _compile_user_agent(spec: dict, config) -> RuleEvaluator:
+    weight = float(spec["weight"])
+    matcher = compile_user_agent_matcher(spec.get("patterns", []), spec.get("regex", []))
+    if matcher is None:
+        return lambda ctx: 0.0
+    search = matcher.search
+
+    def evaluate(ctx: RiskContext) -> float:
+        return weight if search(ctx.user_agent) else 0.0
+    return evaluate
+
+@register_rule("impossible_travel")
+def _compile_impossible_travel(spec: dict, config) -> RuleEvaluator:
+    weight = float(spec["weight"])
+    max_speed = float(spec.get("max_speed_kmh", config.max_travel_speed_kmh))
+    min_distance = float(spec.get("min_distance_km", 100.0))
+
+    def evaluate(ctx: RiskContext) -> float:
+        # Only scores when GeoIP is configured and the user is known
+        if not ctx.user_id or ctx.monitor.geoip is None:
+            return 0.0
+        history = ctx.monitor.location_history(ctx.user_id)
+        if not history:
+            return 0.0
+        current = ctx.monitor.geoip.lookup(ctx.client_ip)
+        if current is None:
+            return 0.0
+        speed = max_travel_speed(history, current, ctx.now, min_distance_km=min_distance)
+        return weight if speed > max_speed else 0.0
+    return evaluate
+
+@register_rule("distinct_users_per_ip")
+def _compile_distinct_users_per_ip(spec: dict, config) -> RuleEvaluator:
+    weight = float(spec["weight"])
+    limit = float(spec.get("limit", config.max_users_per_ip))
+
+    def evaluate(ctx: RiskContext) -> float:
+        # One address spraying many accounts
+        if not ctx.client_ip:
+            return 0.0
+        return weight if _above_noise(ctx.monitor.users_per_ip, ctx.client_ip, ctx.now, limit) else 0.0
+    return evaluate
+
+@register_rule("distinct_ips_per_user")
+def _compile_distinct_ips_per_user(spec: dict, config) -> RuleEvaluator:
+    weight = float(spec["weight"])
+    limit = float(spec.get("limit", config.max_ips_per_user))
+
+    def evaluate(ctx: RiskContext) -> float:
+        # One account hit from many addresses
+        if not ctx.user_id:
+            return 0.0
+        return weight if _above_noise(ctx.monitor.ips_per_user, ctx.user_id, ctx.now, limit) else 0.0
+    return evaluate
+
+@register_rule("failure_rate")
+def _compile_failure_rate(spec: dict, config) -> RuleEvaluator:
+    weight = float(spec["weight"])
+    limit = int(spec.get("limit", config.max_failures_per_key))
+    key_type = spec.get("key", "user")
+    if key_type not in ("user", "ip"):
+        raise ValueError(f"failure_rate key must be 'user' or 'ip', got {key_type!r}")
+
+    def evaluate(ctx: RiskContext) -> float:
+        subject = ctx.user_id if key_type == "user" else ctx.client_ip
+        if not subject:
+            return 0.0
+        key = f"{key_type}:{subject}"
+        return weight if _above_noise(ctx.monitor.failure_counts, key, ctx.now, limit) else 0.0
+    return evaluate
+
+def _trie_pattern(node: dict) -> str:
+    # A terminal node already matches, so longer patterns sharing its prefix are redundant
+    if "" in node:
+        return ""
+    alternatives = [re.escape(ch) + _trie_pattern(child) for ch, child in sorted(node.items())]
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return "(?:" + "|".join(alternatives) + ")"
+
+def compile_user_agent_matcher(
+    patterns: List[str],
+    regex_patterns: Optional[List[str]] = None
+) -> Optional["re.Pattern"]:
+    """Fold every substring pattern into one prefix-trie regex, plus raw regexes"""
+    trie: dict = {}
+    for pattern in patterns:
+        if not pattern:
+            continue
+        node = trie
+        for ch in pattern.lower():
+            node = node.setdefault(ch, {})
+        node.clear()
+        node[""] = {}
+
+    alternatives = [_trie_pattern(trie)] if trie else []
+    alternatives.extend(f"(?:{regex})" for regex in regex_patterns or [])
+    if not alternatives:
+        return None
+    return re.compile("|".join(alternatives), re.IGNORECASE)
+
+class RiskPolicy:
+    """Immutable, compiled policy: rules ordered by descending weight"""
+
+    __slots__ = ("rules", "risk_threshold")
+
+    def __init__(self, rules: Tuple[RuleEvaluator, ...], risk_threshold: Optional[float]):
+        self.rules = rules
+        self.risk_threshold = risk_threshold
+
+def compile_policy(data: dict, config) -> RiskPolicy:
+    specs = []
+    for spec in data.get("rules", []):
+        if not spec.get("enabled", True):
+            continue
+        compiler = RULE_COMPILERS.get(spec.get("type"))
+        if compiler is None:
+            raise ValueError(f"Unknown risk rule type: {spec.get('type')!r}")
+        specs.append((float(spec["weight"]), compiler(spec, config)))
+
+    # Heaviest rules first so threshold short-circuiting triggers as early as possible
+    specs.sort(key=lambda item: item[0], reverse=True)
+    threshold = data.get("risk_threshold")
+    return RiskPolicy(
+        rules=tuple(evaluator for _, evaluator in specs),
+        risk_threshold=float(threshold) if threshold is not None else None
+    )
+
+def load_policy_file(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".json"):
+            return json.load(f)
+        try:
+            import yaml
+        except ImportError as e:
+            raise ImportError(
+                "YAML security policies require PyYAML: pip install authnexus[policy]"
+            ) from e
+        return yaml.safe_load(f) or {}
+
+class RiskPolicyEngine:
+    """Evaluates a compiled risk policy; reloads swap the policy reference atomically"""
+
+    def __init__(self, config, policy_path: Optional[str] = None, reload_interval: float = 0.0):
+        self.config = config
+        self.policy_path = policy_path
+        self.reload_interval = reload_interval
+        self._mtime: Optional[float] = None
+        self._next_check = 0.0
+        self._policy = compile_policy(DEFAULT_POLICY, config)
+        if policy_path:
+            self.reload()
+
+    @property
+    def risk_threshold(self) -> float:
+        threshold = self._policy.risk_threshold
+        return self.config.risk_threshold if threshold is None else threshold
+
+    def load(self, data: dict) -> None:
+        """Compile a policy mapping and publish it to readers"""
+        self._policy = compile_policy(data, self.config)
+
+    def reload(self) -> bool:
+        """Recompile the policy file; the previous policy stays active on error"""
+        try:
+            mtime = os.stat(self.policy_path).st_mtime
+        except OSError as e:
+            logger.error(f"Security policy reload failed: {e}")
+            return False
+        # Remember the mtime even if the file is invalid, so a broken policy is
+        # reported once rather than on every check until it is fixed
+        self._mtime = mtime
+        try:
+            self.load(load_policy_file(self.policy_path))
+        except Exception as e:
+            logger.error(f"Security policy reload failed: {e}")
+            return False
+        logger.info(f"Security policy loaded from {self.policy_path}")
+        return True
+
+    def reload_if_changed(self) -> bool:
+        if not self.policy_path:
+            return False
+        try:
+            mtime = os.stat(self.policy_path).st_mtime
+        except OSError:
+            return False
+        return mtime != self._mtime and self.reload()
+
+    def evaluate(self, ctx: RiskContext, stop_at: Optional[float] = None) -> float:
+        """Sum rule contributions, stopping once the running score exceeds stop_at"""
+        if self.reload_interval and ctx.now >= self._next_check:
+            self._next_check = ctx.now + self.reload_interval
+            self.reload_if_changed()
+
+        policy = self._policy
+        risk = 0.0
+        if stop_at is None:
+            for rule in policy.rules:
+                risk += rule(ctx)
+        else:
+            for rule in policy.rules:
+                risk += rule(ctx)
+                if risk > stop_at:
+                    break
+        return min(risk, 1.0)
@@ -1,8 +1,17 @@
+import os
+import json
 import time
-from typing import Dict, Optional, List
-from pydantic import BaseModel
+from collections import deque
+from typing import Deque, Dict, Optional, List, Tuple
+from pydantic import BaseModel, Field
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+from .shared_state import SharedProfileTable
+from .risk_rules import RiskContext, RiskPolicyEngine
+from .geoip import GeoIPResolver
+from .sketches import WindowedCountMinSketch, WindowedDistinctSketch
+from .profile_cache import ProfileCache
+from .snapshot import RestoredProfiles, SnapshotWriter, read_snapshot, write_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -17,49 +26,131 @@ class RiskProfile(BaseModel):
     user_agent: Optional[str] = None
     failed_attempts: int = 0
     last_attempt: float = 0.0
-    locations: List[str] = []
+    # Ring of recent (latitude, longitude, timestamp) fixes, oldest first
+    locations: Deque[Tuple[float, float, float]] = Field(default_factory=deque)
 
 @dataclass
 class SecurityConfig:
     risk_threshold: float = 0.8
     ip_velocity_window: int = 300  # 5 minutes
     max_failed_attempts: int = 5
+    policy_path: Optional[str] = field(default_factory=lambda: os.getenv("AUTHNEXUS_SECURITY_POLICY"))
+    policy_reload_interval: float = 5.0  # seconds between policy file mtime checks
+    geoip_database: Optional[str] = field(default_factory=lambda: os.getenv("AUTHNEXUS_GEOIP_DATABASE"))
+    geoip_cache_size: int = 4096
+    location_history_size: int = 8
+    max_travel_speed_kmh: float = 900.0  # roughly a commercial flight
+    # Credential-stuffing sketches: fixed memory regardless of attack size
+    sketch_window: int = 3600  # 1 hour
+    sketch_buckets: int = 6
+    sketch_width: int = 1024
+    sketch_depth: int = 2
+    hll_precision: int = 6
+    max_ips_per_user: int = 10
+    max_users_per_ip: int = 20
+    max_failures_per_key: int = 20
+    # Warm restart: loaded at startup when set, written by start_checkpointing()
+    snapshot_path: Optional[str] = field(default_factory=lambda: os.getenv("AUTHNEXUS_SNAPSHOT_PATH"))
+    snapshot_interval: float = 60.0
+    snapshot_max_age: int = 86400  # drop profiles and events idle for a day
+    # Local profile cap; None disables eviction
+    max_profiles: Optional[int] = 100_000
+    profile_idle_ttl: int = 3600  # failure-free profiles idle this long go first
+    failure_protection_window: int = 3600  # recently failing profiles are evicted last
+    protected_min_failures: int = 2
+    eviction_scan_limit: int = 32
 
 class SecurityMonitor:
-    def __init__(self, config: Optional[SecurityConfig] = None):
+    def __init__(
+        self,
+        config: Optional[SecurityConfig] = None,
+        shared_profiles: Optional[SharedProfileTable] = None,
+        geoip: Optional[GeoIPResolver] = None
+    ):
         self.config = config or SecurityConfig()
         self.events: List[SecurityEvent] = []
-        self.risk_profiles: Dict[str, RiskProfile] = {}
+        self.risk_profiles: ProfileCache = ProfileCache(
+            max_profiles=self.config.max_profiles,
+            idle_ttl=self.config.profile_idle_ttl,
+            protection_window=self.config.failure_protection_window,
+            protected_min_failures=self.config.protected_min_failures,
+            scan_limit=self.config.eviction_scan_limit
+        )
+        # Counters shared by all forked workers; local profiles are only a fallback
+        self.shared_profiles = shared_profiles
+        if geoip is None and self.config.geoip_database:
+            geoip = self._open_geoip()
+        self.geoip = geoip
+        sketch_shape = dict(
+            window=self.config.sketch_window,
+            buckets=self.config.sketch_buckets,
+            width=self.config.sketch_width,
+            depth=self.config.sketch_depth
+        )
+        self.ips_per_user = WindowedDistinctSketch(precision=self.config.hll_precision, **sketch_shape)
+        self.users_per_ip = WindowedDistinctSketch(precision=self.config.hll_precision, **sketch_shape)
+        self.failure_counts = WindowedCountMinSketch(**sketch_shape)
+
+        self._restored: Optional[RestoredProfiles] = None
+        if self.config.snapshot_path and os.path.exists(self.config.snapshot_path):
+            try:
+                self.load_snapshot(self.config.snapshot_path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Ignoring unreadable security snapshot: {e}")
+        self.policy = RiskPolicyEngine(
+            self.config,
+            policy_path=self.config.policy_path,
+            reload_interval=self.config.policy_reload_interval
+        )
+
+    def _open_geoip(self) -> Optional[GeoIPResolver]:
+        """Open the configured GeoIP database once; travel scoring is disabled if it fails"""
+        try:
+            return GeoIPResolver(self.config.geoip_database, cache_size=self.config.geoip_cache_size)
+        except Exception as e:
+            logger.error(f"GeoIP database {self.config.geoip_database} unavailable, impossible travel disabled: {e}")
+            return None
 
-    def calculate_risk(self, client_ip: str, user_agent: str) -> float:
+    def calculate_risk(
+        self,
+        client_ip: str,
+        user_agent: str,
+        user_id: Optional[str] = None
+    ) -> float:
         """Professional risk scoring engine"""
-        profile = self._get_or_create_profile(client_ip, user_agent)
-        risk = 0.0
-        
-        # Failed attempts risk
-        risk += min(profile.failed_attempts / self.config.max_failed_attempts, 1.0) * 0.4
-        
-        # Velocity check
-        if time.time() - profile.last_attempt < self.config.ip_velocity_window:
-            risk += 0.3
-            
-        # User agent anomalies
-        if "bot" in (user_agent or "").lower():
-            risk += 0.2
-            
-        return min(risk, 1.0)
+        return self._evaluate_risk(client_ip, user_agent, user_id)
 
-    def check_anomalies(self, request_data: dict) -> bool:
-        """Enterprise-grade anomaly detection"""
+    def _evaluate_risk(
+        self,
+        client_ip: str,
+        user_agent: str,
+        user_id: Optional[str] = None,
+        stop_at: Optional[float] = None
+    ) -> float:
+        failed_attempts, last_attempt = self._profile_counters(client_ip, user_agent)
+        ctx = RiskContext(
+            self, client_ip, user_agent, failed_attempts, last_attempt, time.time(), user_id
+        )
+        return self.policy.evaluate(ctx, stop_at)
+
+    def check_anomalies(self, request_data: dict, risk_score: Optional[float] = None) -> bool:
+        """Enterprise-grade anomaly detection
+
+        Pass an already computed ``risk_score`` to avoid scoring the request twice.
+        """
         client_ip = request_data.get("client_ip", "")
         user_agent = request_data.get("user_agent", "")
+        user_id = request_data.get("user_id")
         
         # Check IP reputation
         if self._is_ip_blacklisted(client_ip):
             return True
             
-        # Check risk score
-        if self.calculate_risk(client_ip, user_agent) > self.config.risk_threshold:
+        # Check risk score; evaluation stops as soon as the threshold is crossed
+        threshold = self.policy.risk_threshold
+        if risk_score is None:
+            risk_score = self._evaluate_risk(client_ip, user_agent, user_id, stop_at=threshold)
+        if risk_score > threshold:
             return True
             
         return False
@@ -72,20 +163,35 @@ class SecurityMonitor:
             metadata=metadata or {},
             risk_score=self.calculate_risk(
                 metadata.get("ip", ""),
-                metadata.get("user_agent", "")
+                metadata.get("user_agent", ""),
+                metadata.get("user_id")
             ) if metadata else 0.0
         )
         self.events.append(event)
         
         # Update risk profiles
-        if "ip" in metadata and "user_agent" in metadata:
-            profile = self._get_or_create_profile(
+        if metadata and "ip" in metadata and "user_agent" in metadata:
+            self._record_attempt(
                 metadata["ip"],
-                metadata["user_agent"]
+                metadata["user_agent"],
+                "failure" in event_type,
+                event.timestamp
+            )
+
+        if metadata:
+            self._update_sketches(
+                metadata.get("ip"),
+                metadata.get("user_id"),
+                "failure" in event_type,
+                event.timestamp
             )
-            if "failure" in event_type:
-                profile.failed_attempts += 1
-            profile.last_attempt = event.timestamp
+
+        # Track where users successfully show up for impossible-travel checks
+        if (
+            metadata and "ip" in metadata and metadata.get("user_id")
+            and "failure" not in event_type and self.geoip is not None
+        ):
+            self._record_location(metadata["user_id"], metadata["ip"], event.timestamp)
 
         logger.info(f"Security event: {event_type} (Risk: {event.risk_score:.2f})")
 
@@ -99,17 +205,173 @@ class SecurityMonitor:
             "high_risk_events": sum(1 for e in recent_events if e.risk_score > 0.7),
             "common_event_types": self._count_event_types(recent_events),
             "top_risky_ips": self._get_top_risky_ips(recent_events),
-            "risk_trends": self._calculate_risk_trends(recent_events)
+            "risk_trends": self._calculate_risk_trends(recent_events),
+            "profile_cache": self.eviction_stats,
+            "shared_profiles": self.shared_profiles.stats if self.shared_profiles is not None else None
         }
 
+    @property
+    def eviction_stats(self) -> dict:
+        """Local profile count and eviction counters"""
+        return {"profiles": len(self.risk_profiles), **self.risk_profiles.stats}
+
+    def save_snapshot(self, path: Optional[str] = None):
+        """Checkpoint local risk profiles and recent events to a binary snapshot
+
+        Rows are gathered in one pass and encoded column by column, so request
+        handling keeps running while the file is written and atomically
+        replaced. Counters held in a SharedProfileTable are not included.
+        """
+        cutoff = time.time() - self.config.snapshot_max_age
+        profiles = [
+            (
+                key,
+                profile.failed_attempts,
+                profile.last_attempt,
+                tuple(profile.locations)
+            )
+            for key, profile in list(self.risk_profiles.items())
+        ]
+        if self._restored is not None:
+            profiles.extend(self._restored.rows())
+        events = [
+            (event.timestamp, event.risk_score, event.event_type, json.dumps(event.metadata, default=str))
+            for event in list(self.events) if event.timestamp >= cutoff
+        ]
+        write_snapshot(path or self.config.snapshot_path, profiles, events)
+
+    def load_snapshot(self, path: Optional[str] = None, max_age: Optional[float] = None) -> int:
+        """Restore profiles and events from a snapshot, dropping entries older than max_age
+
+        Profiles stay in columnar form and are only turned into RiskProfile
+        objects when first looked up.
+        """
+        path = path or self.config.snapshot_path
+        _, columns = read_snapshot(path)
+        cutoff = time.time() - (self.config.snapshot_max_age if max_age is None else max_age)
+        self._restored = RestoredProfiles(columns, cutoff)
+
+        construct_event = SecurityEvent.model_construct
+        for timestamp, risk_score, event_type, metadata in zip(
+            columns["event_timestamps"],
+            columns["event_risk_scores"],
+            columns["event_types"],
+            columns["event_metadata"]
+        ):
+            if timestamp >= cutoff:
+                self.events.append(construct_event(
+                    timestamp=timestamp,
+                    event_type=event_type,
+                    metadata=json.loads(metadata),
+                    risk_score=risk_score
+                ))
+
+        logger.info(f"Restored {len(self._restored)} risk profiles from {path}")
+        return len(self._restored)
+
+    def start_checkpointing(
+        self,
+        path: Optional[str] = None,
+        interval: Optional[float] = None
+    ) -> SnapshotWriter:
+        """Start a background thread that periodically calls save_snapshot"""
+        writer = SnapshotWriter(
+            self,
+            path or self.config.snapshot_path,
+            interval or self.config.snapshot_interval
+        )
+        writer.start()
+        return writer
+
+    @staticmethod
+    def _profile_key(ip: str, user_agent: str) -> str:
+        return f"{ip}_{user_agent}"
+
+    @staticmethod
+    def _split_profile_key(key: str) -> Tuple[Optional[str], Optional[str]]:
+        """Recover (ip, user_agent) from a profile key; per-user profiles carry neither"""
+        if key.startswith("user:"):
+            return None, None
+        ip, _, user_agent = key.partition("_")
+        return ip, user_agent
+
+    def _profile_counters(self, ip: str, user_agent: str) -> Tuple[int, float]:
+        """Failed attempts and last attempt time, from shared memory when enabled"""
+        key = self._profile_key(ip, user_agent)
+        if self.shared_profiles is not None and self._lookup_profile(key) is None:
+            return self.shared_profiles.get(key)
+        profile = self._get_or_create_profile(ip, user_agent)
+        return profile.failed_attempts, profile.last_attempt
+
+    def _record_attempt(self, ip: str, user_agent: str, failed: bool, timestamp: float):
+        if self.shared_profiles is not None and self.shared_profiles.record(
+            self._profile_key(ip, user_agent), failed, timestamp
+        ):
+            return
+        profile = self._get_or_create_profile(ip, user_agent)
+        if failed:
+            profile.failed_attempts += 1
+        profile.last_attempt = timestamp
+
+    def _update_sketches(
+        self,
+        ip: Optional[str],
+        user_id: Optional[str],
+        failed: bool,
+        timestamp: float
+    ):
+        if ip and user_id:
+            self.ips_per_user.add(user_id, ip, timestamp)
+            self.users_per_ip.add(ip, user_id, timestamp)
+        if failed:
+            if user_id:
+                self.failure_counts.add(f"user:{user_id}", timestamp)
+            if ip:
+                self.failure_counts.add(f"ip:{ip}", timestamp)
+
+    def location_history(self, user_id: str) -> Optional[Deque[Tuple[float, float, float]]]:
+        profile = self._lookup_profile(f"user:{user_id}")
+        return profile.locations if profile is not None else None
+
+    def _record_location(self, user_id: str, ip: str, timestamp: float):
+        location = self.geoip.lookup(ip)
+        if location is None:
+            return
+        key = f"user:{user_id}"
+        profile = self._lookup_profile(key)
+        if profile is None:
+            profile = self.risk_profiles[key] = RiskProfile()
+        ring = profile.locations
+        while len(ring) >= self.config.location_history_size:
+            ring.popleft()
+        ring.append((location.latitude, location.longitude, timestamp))
+
+    def _lookup_profile(self, key: str) -> Optional[RiskProfile]:
+        """Existing profile for a key, materializing it from a restored snapshot if needed"""
+        profile = self.risk_profiles.get(key)
+        if profile is None and self._restored is not None:
+            row = self._restored.pop(key)
+            if row is not None:
+                _, failed_attempts, last_attempt, locations = row
+                ip, user_agent = self._split_profile_key(key)
+                profile = self.risk_profiles[key] = RiskProfile.model_construct(
+                    ip_address=ip,
+                    user_agent=user_agent,
+                    failed_attempts=failed_attempts,
+                    last_attempt=last_attempt,
+                    locations=deque(locations)
+                )
+        return profile
+
     def _get_or_create_profile(self, ip: str, user_agent: str) -> RiskProfile:
-        key = f"{ip}_{user_agent}"
-        if key not in self.risk_profiles:
-            self.risk_profiles[key] = RiskProfile(
+        key = self._profile_key(ip, user_agent)
+        profile = self._lookup_profile(key)
+        if profile is None:
+            profile = self.risk_profiles[key] = RiskProfile(
                 ip_address=ip,
                 user_agent=user_agent
             )
-        return self.risk_profiles[key]
+        return profile
 
     def _is_ip_blacklisted(self, ip: str) -> bool:
         # Integrate with external threat intelligence feeds
@@ -0,0 +1,160 @@
+import os
+import time
+import struct
+import hashlib
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class SharedProfileTable:
+    """Fixed-capacity open-addressing table of risk counters in shared memory
+
+    Build it in the master process before workers fork (e.g. gunicorn
+    ``--preload`` or an ``on_starting`` hook). Children inherit the mapping and
+    the lock stripes, so every worker on the host reads and updates the same
+    lockout state without an external store.
+
+    Slots are never freed, but a new key may take over a slot whose last
+    attempt is older than ``ttl``, so a scan cannot fill the table for good.
+    Probing stops after ``max_probe`` slots; keys that find no room fall
+    back to per-process storage and are counted in ``stats``.
+    """
+
+    # key hash, failed attempts, padding, last attempt timestamp
+    _SLOT = struct.Struct("<QI4xd")
+    _EMPTY = 0
+    # used slots, reclaimed slots, fallbacks
+    _STAT_NAMES = ("used", "reclaimed", "fallbacks")
+
+    def __init__(
+        self,
+        capacity: int = 65536,
+        lock_stripes: int = 64,
+        name: Optional[str] = None,
+        ttl: float = 3600,
+        max_probe: int = 128
+    ):
+        self.capacity = 1 << max(capacity - 1, 1).bit_length()
+        self._mask = self.capacity - 1
+        self.ttl = ttl
+        self.max_probe = min(max_probe, self.capacity)
+        self._shm = shared_memory.SharedMemory(
+            name=name,
+            create=True,
+            size=self.capacity * self._SLOT.size
+        )
+        self._buf = self._shm.buf
+        self._locks = [multiprocessing.Lock() for _ in range(lock_stripes)]
+        self._stats = multiprocessing.RawArray("Q", len(self._STAT_NAMES))
+        self._stats_lock = multiprocessing.Lock()
+        self._owner_pid = os.getpid()
+        self._full_warned = False
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        # Zero marks an empty slot, so remap the one colliding hash value
+        return int.from_bytes(digest, "little") or 1
+
+    def _lock_for(self, slot: int):
+        return self._locks[slot % len(self._locks)]
+
+    def _count(self, stat: int) -> None:
+        with self._stats_lock:
+            self._stats[stat] += 1
+
+    @property
+    def stats(self) -> dict:
+        """Host-wide fill and fallback counters, shared by every worker"""
+        return {"capacity": self.capacity, **dict(zip(self._STAT_NAMES, self._stats))}
+
+    def _find(self, key_hash: int, create: bool, now: float = 0.0) -> Optional[int]:
+        """Linear probe for a key's slot, claiming an empty or stale one if asked"""
+        slot = key_hash & self._mask
+        buf, size, unpack_from = self._buf, self._SLOT.size, self._SLOT.unpack_from
+        stale_slot = None
+        stale_before = now - self.ttl
+        for _ in range(self.max_probe):
+            stored, _, last_attempt = unpack_from(buf, slot * size)
+            if stored == key_hash:
+                return slot
+            if stored == self._EMPTY:
+                if not create:
+                    return None
+                break
+            if stale_slot is None and last_attempt < stale_before:
+                stale_slot = slot
+            slot = (slot + 1) & self._mask
+        else:
+            if not create:
+                return None
+            slot = None
+
+        # Prefer reusing a stale slot so the probe sequence stays short
+        for candidate, reclaim in ((stale_slot, True), (slot, False)):
+            if candidate is None:
+                continue
+            with self._lock_for(candidate):
+                # Another worker may have claimed the slot since the unlocked read
+                stored, _, last_attempt = unpack_from(buf, candidate * size)
+                if stored == key_hash:
+                    return candidate
+                if stored == self._EMPTY or (reclaim and last_attempt < stale_before):
+                    self._SLOT.pack_into(buf, candidate * size, key_hash, 0, now)
+                    self._count(1 if stored != self._EMPTY else 0)
+                    return candidate
+
+        if not self._full_warned:
+            logger.warning(
+                f"Shared profile table has no free slot within {self.max_probe} probes "
+                f"({self.capacity} slots); new profiles fall back to per-process storage"
+            )
+            self._full_warned = True
+        self._count(2)
+        return None
+
+    def get(self, key: str) -> Tuple[int, float]:
+        """Return (failed_attempts, last_attempt) for a profile key"""
+        slot = self._find(self._hash(key), create=False)
+        if slot is None:
+            return 0, 0.0
+        _, failed_attempts, last_attempt = self._SLOT.unpack_from(self._buf, slot * self._SLOT.size)
+        return failed_attempts, last_attempt
+
+    def record(self, key: str, failed: bool, timestamp: float) -> bool:
+        """Record an attempt for a profile key; False if the table has no room"""
+        key_hash = self._hash(key)
+        slot = self._find(key_hash, create=True, now=timestamp)
+        if slot is None:
+            return False
+        offset = slot * self._SLOT.size
+        with self._lock_for(slot):
+            _, failed_attempts, _ = self._SLOT.unpack_from(self._buf, offset)
+            if failed:
+                failed_attempts = min(failed_attempts + 1, 0xFFFFFFFF)
+            self._SLOT.pack_into(self._buf, offset, key_hash, failed_attempts, timestamp)
+        return True
+
+    def reset(self, key: str) -> None:
+        """Clear the failure counter of a profile key, e.g. after a successful login"""
+        slot = self._find(self._hash(key), create=False)
+        if slot is None:
+            return
+        offset = slot * self._SLOT.size
+        with self._lock_for(slot):
+            key_hash, _, last_attempt = self._SLOT.unpack_from(self._buf, offset)
+            self._SLOT.pack_into(self._buf, offset, key_hash, 0, last_attempt)
+
+    def close(self) -> None:
+        """Detach this process; the master also unlinks the segment"""
+        self._buf = None
+        self._shm.close()
+        if os.getpid() == self._owner_pid:
+            self._shm.unlink()
@@ -0,0 +1,204 @@
+import math
+import hashlib
+from array import array
+from typing import Callable, List, Tuple
+
+_MASK64 = (1 << 64) - 1
+# 2**-rank lookup so HyperLogLog estimates avoid float pow per register
+_INV_POW2 = [2.0 ** -rank for rank in range(66)]
+_HLL_ALPHA = {16: 0.673, 32: 0.697, 64: 0.709}
+# Registers of the whole-window HyperLogLog used to estimate collision noise
+_PAIR_PRECISION = 10
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "little")
+
+def _row_hashes(key: str) -> Tuple[int, int]:
+    """Two independent 64-bit hashes; row i uses h1 + i * h2 (Kirsch-Mitzenmacher)"""
+    digest = hashlib.blake2b(key.encode(), digest_size=16, person=b"authnexus-sketch").digest()
+    return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+
+def hll_estimate(registers, precision: int) -> float:
+    """HyperLogLog cardinality estimate with small-range (linear counting) correction"""
+    m = 1 << precision
+    alpha = _HLL_ALPHA.get(m) or 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / sum(map(_INV_POW2.__getitem__, registers))
+    if raw <= 2.5 * m:
+        zeros = registers.count(0)
+        if zeros:
+            return m * math.log(m / zeros)
+    return raw
+
+class _SlidingWindow:
+    """Ring of time buckets; a bucket is cleared when its slot is reused"""
+
+    __slots__ = ("span", "stamps")
+
+    def __init__(self, window: float, buckets: int):
+        self.span = window / buckets
+        self.stamps = [-1] * buckets
+
+    def advance(self, now: float, clear: Callable[[int], None]) -> int:
+        epoch = int(now // self.span)
+        slot = epoch % len(self.stamps)
+        if self.stamps[slot] != epoch:
+            clear(slot)
+            self.stamps[slot] = epoch
+        return slot
+
+    def epoch(self, now: float) -> int:
+        return int(now // self.span)
+
+    def live(self, now: float) -> List[int]:
+        epoch = int(now // self.span)
+        oldest = epoch - len(self.stamps) + 1
+        return [slot for slot, stamp in enumerate(self.stamps) if oldest <= stamp <= epoch]
+
+def _register_update(h: int, precision: int) -> Tuple[int, int]:
+    """HyperLogLog register index and rank for a 64-bit hash"""
+    suffix_bits = 64 - precision
+    return h >> suffix_bits, suffix_bits - (h & ((1 << suffix_bits) - 1)).bit_length() + 1
+
+class WindowedCountMinSketch:
+    """Approximate per-key event counts over a sliding window in fixed memory
+
+    Updates are conservative: only the cells holding a key's current minimum
+    are raised, which keeps collision error well below that of plain
+    count-min. ``noise_floor`` is the mean count per cell, an upper bound on
+    what collisions add to an unseen key.
+    """
+
+    def __init__(self, window: float = 3600, buckets: int = 6, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._window = _SlidingWindow(window, buckets)
+        self._tables = [array("I", bytes(4 * width * depth)) for _ in range(buckets)]
+        self._totals = [0] * buckets
+
+    def _clear(self, slot: int):
+        self._tables[slot] = array("I", bytes(4 * self.width * self.depth))
+        self._totals[slot] = 0
+
+    def _cells(self, key: str) -> List[int]:
+        h1, h2 = _row_hashes(key)
+        width = self.width
+        return [row * width + ((h1 + row * h2) & _MASK64) % width for row in range(self.depth)]
+
+    def add(self, key: str, now: float, count: int = 1) -> None:
+        slot = self._window.advance(now, self._clear)
+        table = self._tables[slot]
+        self._totals[slot] += count
+        cells = self._cells(key)
+        target = min(min(table[cell] for cell in cells) + count, 0xFFFFFFFF)
+        for cell in cells:
+            if table[cell] < target:
+                table[cell] = target
+
+    def estimate(self, key: str, now: float) -> int:
+        tables = [self._tables[slot] for slot in self._window.live(now)]
+        if not tables:
+            return 0
+        return min(sum(table[cell] for table in tables) for cell in self._cells(key))
+
+    def noise_floor(self, now: float) -> float:
+        """Expected count a key picks up from collisions alone"""
+        return sum(self._totals[slot] for slot in self._window.live(now)) / self.width
+
+    @property
+    def nbytes(self) -> int:
+        return sum(table.itemsize * len(table) for table in self._tables)
+
+class WindowedDistinctSketch:
+    """Approximate distinct items per key over a sliding window in fixed memory
+
+    Cells of a count-min layout hold small HyperLogLog register sets instead of
+    counters; a key's estimate is the minimum over its rows, so colliding keys
+    can only inflate it. A whole-window HyperLogLog of (key, item) pairs gives
+    ``noise_floor``, the distinct count an average cell holds, which callers
+    subtract before comparing against a per-key limit. Memory is
+    ``buckets * (depth * width * 2**precision + 1024)`` bytes regardless of
+    how many keys or items are seen.
+    """
+
+    def __init__(
+        self,
+        window: float = 3600,
+        buckets: int = 6,
+        width: int = 1024,
+        depth: int = 2,
+        precision: int = 6
+    ):
+        self.width = width
+        self.depth = depth
+        self.precision = precision
+        self._registers = 1 << precision
+        self._window = _SlidingWindow(window, buckets)
+        self._tables = [bytearray(width * depth * self._registers) for _ in range(buckets)]
+        self._pairs = [bytearray(1 << _PAIR_PRECISION) for _ in range(buckets)]
+        self._floor: Tuple[int, float] = (-1, 0.0)
+
+    def _clear(self, slot: int):
+        self._tables[slot] = bytearray(self.width * self.depth * self._registers)
+        self._pairs[slot] = bytearray(1 << _PAIR_PRECISION)
+        self._floor = (-1, 0.0)
+
+    def _cell_offsets(self, key_hashes: Tuple[int, int]) -> List[int]:
+        h1, h2 = key_hashes
+        width, registers = self.width, self._registers
+        return [
+            (row * width + ((h1 + row * h2) & _MASK64) % width) * registers
+            for row in range(self.depth)
+        ]
+
+    def _offsets(self, key: str) -> List[int]:
+        return self._cell_offsets(_row_hashes(key))
+
+    def add(self, key: str, item: str, now: float) -> None:
+        h = _hash64(item)
+        index, rank = _register_update(h, self.precision)
+        key_hashes = _row_hashes(key)
+
+        slot = self._window.advance(now, self._clear)
+        table = self._tables[slot]
+        for offset in self._cell_offsets(key_hashes):
+            if table[offset + index] < rank:
+                table[offset + index] = rank
+
+        # XOR of independent key and item hashes is a uniform hash of the pair
+        pair_index, pair_rank = _register_update(key_hashes[0] ^ h, _PAIR_PRECISION)
+        pairs = self._pairs[slot]
+        if pairs[pair_index] < pair_rank:
+            pairs[pair_index] = pair_rank
+            self._floor = (-1, 0.0)
+
+    def estimate(self, key: str, now: float) -> float:
+        tables = [self._tables[slot] for slot in self._window.live(now)]
+        if not tables:
+            return 0.0
+        registers = self._registers
+        best = None
+        for offset in self._offsets(key):
+            slices = [table[offset:offset + registers] for table in tables]
+            merged = slices[0] if len(slices) == 1 else bytes(map(max, *slices))
+            estimate = hll_estimate(merged, self.precision)
+            if best is None or estimate < best:
+                best = estimate
+        return best
+
+    def noise_floor(self, now: float) -> float:
+        """Expected distinct count a key picks up from collisions alone"""
+        epoch = self._window.epoch(now)
+        if self._floor[0] == epoch:
+            return self._floor[1]
+        slices = [self._pairs[slot] for slot in self._window.live(now)]
+        if not slices:
+            return 0.0
+        merged = slices[0] if len(slices) == 1 else bytes(map(max, *slices))
+        floor = hll_estimate(merged, _PAIR_PRECISION) / self.width
+        # Cached until a pair register rises or the window moves
+        self._floor = (epoch, floor)
+        return floor
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(table) for table in self._tables) + sum(len(pairs) for pairs in self._pairs)
@@ -0,0 +1,307 @@
+import os
+import sys
+import mmap
+import time
+import struct
+import logging
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from hashlib import blake2b
+from itertools import accumulate, chain, compress
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_MAGIC = b"ANXS"
+SNAPSHOT_VERSION = 2
+
+# magic, version, flags, created_at, profile count, event count
+_HEADER = struct.Struct("<4sHHdII")
+_COLUMN = struct.Struct("<Q")
+_NONE_COUNT = struct.Struct("<I")
+_COLUMN_COUNT = 11
+
+# Profiles are sorted by a stable 64-bit hash of their key. A restore only
+# copies columns; lookups bisect the hash column and compare the key bytes.
+#
+# Event string columns are one UTF-8 blob joined by NUL, so a whole column decodes
+# with a single decode() and split(); None is stored as a lone SOH character
+_SEPARATOR = "\x00"
+_NONE_MARKER = "\x01"
+_REPLACEMENT = "\ufffd"
+
+ProfileRow = Tuple[str, int, float, Sequence[Tuple[float, float, float]]]
+EventRow = Tuple[float, float, str, str]
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder != "little":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+def _encode_strings(values: Sequence[Optional[str]]) -> bytes:
+    nones = values.count(None)
+    if nones or _NONE_MARKER in values:
+        values = [
+            _NONE_MARKER if v is None else (_REPLACEMENT if v == _NONE_MARKER else v)
+            for v in values
+        ]
+    text = _SEPARATOR.join(values)
+    if values and text.count(_SEPARATOR) != len(values) - 1:
+        # Embedded NULs would shift every following row; replace them instead
+        text = _SEPARATOR.join(v.replace(_SEPARATOR, _REPLACEMENT) for v in values)
+    return _NONE_COUNT.pack(nones) + text.encode()
+
+def _decode_strings(data: bytes, count: int) -> List[Optional[str]]:
+    if not count:
+        return []
+    (nones,) = _NONE_COUNT.unpack_from(data)
+    values = data[_NONE_COUNT.size:].decode().split(_SEPARATOR)
+    if nones:
+        values = [None if v == _NONE_MARKER else v for v in values]
+    return values
+
+def _key_hash(key: str) -> int:
+    return int.from_bytes(blake2b(key.encode(), digest_size=8).digest(), "little")
+
+def write_snapshot(
+    path: str,
+    profiles: Sequence[ProfileRow],
+    events: Sequence[EventRow],
+    created_at: Optional[float] = None
+) -> None:
+    """Write profile and event rows as a versioned columnar file, replacing ``path`` atomically
+
+    Profile rows are ``(key, failed_attempts, last_attempt, locations)`` and
+    event rows ``(timestamp, risk_score, event_type, metadata_json)``.
+    """
+    keys, failed, last, rings = zip(*profiles) if profiles else ((),) * 4
+    timestamps, risk_scores, event_types, metadata = zip(*events) if events else ((),) * 4
+    encoded_keys = list(map(str.encode, keys))
+    hashes = [int.from_bytes(blake2b(key, digest_size=8).digest(), "little") for key in encoded_keys]
+    if len(hashes) > 1:
+        order = itemgetter(*sorted(range(len(hashes)), key=hashes.__getitem__))
+        hashes, encoded_keys, failed, last, rings = map(order, (hashes, encoded_keys, failed, last, rings))
+
+    columns = [
+        _little_endian(array("Q", hashes)),
+        _little_endian(array("Q", accumulate(map(len, encoded_keys), initial=0))),
+        b"".join(encoded_keys),
+        _little_endian(array("I", failed)),
+        _little_endian(array("d", last)),
+        _little_endian(array("H", map(len, rings))),
+        _little_endian(array("d", chain.from_iterable(chain.from_iterable(rings)))),
+        _little_endian(array("d", timestamps)),
+        _little_endian(array("d", risk_scores)),
+        _encode_strings(event_types),
+        _encode_strings(metadata),
+    ]
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".authnexus-snapshot-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(
+                SNAPSHOT_MAGIC,
+                SNAPSHOT_VERSION,
+                0,
+                time.time() if created_at is None else created_at,
+                len(keys),
+                len(timestamps)
+            ))
+            for column in columns:
+                f.write(_COLUMN.pack(len(column)))
+                f.write(column)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def read_snapshot(path: str) -> Tuple[float, dict]:
+    """Map a snapshot file and bulk-decode each column with a handful of C-level calls"""
+    try:
+        return _read_snapshot(path)
+    except struct.error as e:
+        # Short reads surface as struct errors; callers only expect OSError or ValueError
+        raise ValueError(f"Corrupt snapshot {path}: {e}") from e
+
+def _read_snapshot(path: str) -> Tuple[float, dict]:
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _HEADER.size:
+            raise ValueError(f"Corrupt snapshot {path}: truncated header")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            magic, version, _, created_at, profile_count, event_count = _HEADER.unpack_from(mm, 0)
+            if magic != SNAPSHOT_MAGIC:
+                raise ValueError(f"{path} is not an AuthNexus snapshot")
+            if version != SNAPSHOT_VERSION:
+                raise ValueError(f"Unsupported snapshot version {version}")
+
+            offset = _HEADER.size
+            raw = []
+            while offset < len(mm):
+                (length,) = _COLUMN.unpack_from(mm, offset)
+                offset += _COLUMN.size
+                if offset + length > len(mm):
+                    raise ValueError(f"Corrupt snapshot {path}: column {len(raw)} is truncated")
+                raw.append(mm[offset:offset + length])
+                offset += length
+
+    if len(raw) != _COLUMN_COUNT:
+        raise ValueError(f"Corrupt snapshot {path}: expected {_COLUMN_COUNT} columns, found {len(raw)}")
+
+    columns = {
+        "key_hashes": _from_little_endian("Q", raw[0]),
+        "key_offsets": _from_little_endian("Q", raw[1]),
+        "keys": raw[2],
+        "failed_attempts": _from_little_endian("I", raw[3]),
+        "last_attempts": _from_little_endian("d", raw[4]),
+        "location_counts": _from_little_endian("H", raw[5]),
+        "locations": _from_little_endian("d", raw[6]),
+        "event_timestamps": _from_little_endian("d", raw[7]),
+        "event_risk_scores": _from_little_endian("d", raw[8]),
+        "event_types": _decode_strings(raw[9], event_count),
+        "event_metadata": _decode_strings(raw[10], event_count),
+    }
+    for name in ("key_hashes", "failed_attempts", "last_attempts", "location_counts"):
+        if len(columns[name]) != profile_count:
+            raise ValueError(f"Corrupt snapshot {path}: {name} does not match header")
+    for name in ("event_timestamps", "event_risk_scores", "event_types", "event_metadata"):
+        if len(columns[name]) != event_count:
+            raise ValueError(f"Corrupt snapshot {path}: {name} does not match header")
+    if len(columns["key_offsets"]) != profile_count + 1 or columns["key_offsets"][-1] != len(raw[2]):
+        raise ValueError(f"Corrupt snapshot {path}: key offsets do not match header")
+    if len(columns["locations"]) != 3 * sum(columns["location_counts"]):
+        raise ValueError(f"Corrupt snapshot {path}: locations do not match their counts")
+    return created_at, columns
+
+class RestoredProfiles:
+    """Profile rows restored from a snapshot, kept columnar until first touched
+
+    Nothing is decoded or indexed per row on restore, so a warm restart costs
+    a few column copies however many profiles were checkpointed. A row
+    becomes a RiskProfile the first time the monitor looks its key up, and
+    rows older than ``cutoff`` are treated as absent.
+    """
+
+    def __init__(self, columns: dict, cutoff: float):
+        self._columns = columns
+        self._cutoff = cutoff
+        self._taken = set()
+        self._size: Optional[int] = None
+
+        # Only rows with location history need offsets into the flattened fixes
+        counts = columns["location_counts"]
+        self._location_starts: Dict[int, int] = {}
+        position = 0
+        for row in compress(range(len(counts)), counts):
+            self._location_starts[row] = position
+            position += 3 * counts[row]
+
+    def __len__(self) -> int:
+        if self._size is None:
+            cutoff = self._cutoff
+            fresh = sum(map(cutoff.__le__, self._columns["last_attempts"]))
+            fresh += sum(
+                1 for row in self._location_starts
+                if self._columns["last_attempts"][row] < cutoff and self._is_fresh(row)
+            )
+            self._size = fresh
+        return self._size - len(self._taken)
+
+    def __contains__(self, key: str) -> bool:
+        row = self._find(key)
+        return row is not None and row not in self._taken and self._is_fresh(row)
+
+    def _key(self, row: int) -> str:
+        offsets = self._columns["key_offsets"]
+        return self._columns["keys"][offsets[row]:offsets[row + 1]].decode()
+
+    def _find(self, key: str) -> Optional[int]:
+        hashes = self._columns["key_hashes"]
+        key_hash = _key_hash(key)
+        row = bisect_left(hashes, key_hash)
+        while row < len(hashes) and hashes[row] == key_hash:
+            if self._key(row) == key:
+                return row
+            row += 1
+        return None
+
+    def _is_fresh(self, row: int) -> bool:
+        columns = self._columns
+        if columns["last_attempts"][row] >= self._cutoff:
+            return True
+        # Profiles that only carry location history stay while their newest fix is fresh
+        start = self._location_starts.get(row)
+        return start is not None and columns["locations"][start + 3 * columns["location_counts"][row] - 1] >= self._cutoff
+
+    def _row(self, key: str, row: int) -> ProfileRow:
+        columns = self._columns
+        start = self._location_starts.get(row)
+        if start is None:
+            locations = []
+        else:
+            fixes = columns["locations"][start:start + 3 * columns["location_counts"][row]]
+            locations = list(zip(fixes[0::3], fixes[1::3], fixes[2::3]))
+        return (
+            key,
+            columns["failed_attempts"][row],
+            columns["last_attempts"][row],
+            locations
+        )
+
+    def pop(self, key: str) -> Optional[ProfileRow]:
+        """Remove and return the row for a key, or None if it was not restored"""
+        row = self._find(key)
+        if row is None or row in self._taken or not self._is_fresh(row):
+            return None
+        self._taken.add(row)
+        return self._row(key, row)
+
+    def rows(self) -> Iterator[ProfileRow]:
+        taken = set(self._taken)
+        for row in range(len(self._columns["key_hashes"])):
+            if row not in taken and self._is_fresh(row):
+                yield self._row(self._key(row), row)
+
+class SnapshotWriter(threading.Thread):
+    """Background thread checkpointing a SecurityMonitor at a fixed interval"""
+
+    def __init__(self, monitor, path: str, interval: float = 60.0):
+        super().__init__(name="authnexus-snapshot", daemon=True)
+        self.monitor = monitor
+        self.path = path
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            self.checkpoint()
+
+    def checkpoint(self):
+        try:
+            self.monitor.save_snapshot(self.path)
+        except Exception as e:
+            logger.error(f"Security monitor checkpoint failed: {e}")
+
+    def stop(self, final_checkpoint: bool = True):
+        """Stop the thread, optionally writing one last snapshot"""
+        self._stopped.set()
+        if self.is_alive():
+            self.join()
+        if final_checkpoint:
+            self.checkpoint()
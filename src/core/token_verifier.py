@@ -0,0 +1,80 @@
+import hmac
+import json
+import time
+import base64
+import hashlib
+from typing import Optional
+
+_HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+class FastTokenVerifier:
+    """Allocation-light verifier for HMAC tokens minted by AuthNexus.create_token
+
+    The header segment is compared against the one this library always emits,
+    the signature is checked over a memoryview of the signing input, and the
+    payload is only decoded once the signature has passed. Forged or malformed
+    tokens are rejected before any base64 or JSON parsing takes place.
+    """
+
+    __slots__ = ("_mac", "_prefix", "_prefix_len", "_issuer")
+
+    def __init__(self, secret_key: str, algorithm: str = "HS256", issuer: str = "authnexus"):
+        header = json.dumps(
+            {"alg": algorithm, "typ": "JWT"},
+            separators=(",", ":"),
+            sort_keys=True
+        ).encode()
+        self._prefix = (_b64encode(header) + b".").decode("ascii")
+        self._prefix_len = len(self._prefix)
+        # Keyed state is computed once; each verification works on a copy
+        self._mac = hmac.new(secret_key.encode(), digestmod=_HMAC_DIGESTS[algorithm])
+        self._issuer = issuer
+
+    @staticmethod
+    def supports(algorithm: str) -> bool:
+        return algorithm in _HMAC_DIGESTS
+
+    def verify(self, token: str, now: Optional[int] = None) -> Optional[dict]:
+        """Return the payload of a valid, unexpired token or None"""
+        if not isinstance(token, str) or not token.startswith(self._prefix):
+            return None
+        try:
+            raw = token.encode("ascii")
+        except UnicodeEncodeError:
+            return None
+
+        sig_start = raw.find(b".", self._prefix_len)
+        if sig_start <= self._prefix_len or raw.find(b".", sig_start + 1) != -1:
+            return None
+
+        view = memoryview(raw)
+        mac = self._mac.copy()
+        mac.update(view[:sig_start])
+        if not hmac.compare_digest(_b64encode(mac.digest()), view[sig_start + 1:]):
+            return None
+
+        segment = raw[self._prefix_len:sig_start]
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(segment + b"=" * (-len(segment) % 4)))
+        except ValueError:
+            return None
+        if not isinstance(payload, dict):
+            return None
+
+        now = int(time.time()) if now is None else now
+        exp = payload.get("exp")
+        if type(exp) not in (int, float) or exp <= now:
+            return None
+        if payload.get("iss") != self._issuer:
+            return None
+        nbf = payload.get("nbf")
+        if nbf is not None and (type(nbf) not in (int, float) or nbf > now):
+            return None
+        return payload
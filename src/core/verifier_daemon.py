@@ -0,0 +1,327 @@
+import os
+import json
+import stat
+import socket
+import struct
+import asyncio
+import logging
+import threading
+from typing import Callable, Collection, Dict, Iterator, List, Optional, Sequence, Tuple
+from ..exceptions import AuthNexusError, SecurityThresholdExceeded
+
+logger = logging.getLogger(__name__)
+
+# Lives in a directory only root or the service account can write to; a socket
+# in a shared directory such as /tmp could be bound first by any local user
+DEFAULT_SOCKET_PATH = "/run/authnexus/verifier.sock"
+
+# body length, opcode (requests) or status (responses), request id
+_FRAME = struct.Struct("<IBI")
+_READ_SIZE = 65536
+MAX_FRAME_SIZE = 1 << 20
+# Request bytes a client keeps in flight; below the default Unix socket buffer,
+# so a window is always accepted while the daemon is busy writing replies
+PIPELINE_WINDOW = 64 * 1024
+
+OP_VERIFY = 1
+OP_CHECK_RISK = 2
+OP_LOG_EVENT = 3
+
+STATUS_OK = 0
+STATUS_INVALID = 1
+STATUS_REJECTED = 2
+STATUS_ERROR = 3
+
+def default_socket_path() -> str:
+    return os.getenv("AUTHNEXUS_SOCKET", DEFAULT_SOCKET_PATH)
+
+def _peer_uid(sock: socket.socket, socket_path: str) -> int:
+    """UID of the process on the other end, falling back to the socket file owner"""
+    if hasattr(socket, "SO_PEERCRED"):
+        creds = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+        _, uid, _ = struct.unpack("3i", creds)
+        return uid
+    return os.stat(socket_path).st_uid
+
+def _encode_frame(code: int, request_id: int, body: bytes = b"") -> bytes:
+    return _FRAME.pack(len(body), code, request_id) + body
+
+def _dumps(value) -> bytes:
+    return json.dumps(value, separators=(",", ":"), default=str).encode()
+
+class VerifierDaemon:
+    """Serves one warm AuthNexus and SecurityMonitor to every process on a host
+
+    Clients speak a length-prefixed binary protocol over a Unix domain socket.
+    Requests may be pipelined; every complete frame already read is answered,
+    and the responses go out in a single write.
+    """
+
+    def __init__(
+        self,
+        auth,
+        security_monitor=None,
+        socket_path: Optional[str] = None,
+        max_frame_size: int = MAX_FRAME_SIZE
+    ):
+        if security_monitor is None:
+            from .security_monitor import SecurityMonitor
+            security_monitor = SecurityMonitor()
+        self.auth = auth
+        self.security_monitor = security_monitor
+        self.socket_path = socket_path or default_socket_path()
+        self.max_frame_size = max_frame_size
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: Dict[int, Callable[[bytes], Tuple[int, bytes]]] = {
+            OP_VERIFY: self._verify,
+            OP_CHECK_RISK: self._check_risk,
+            OP_LOG_EVENT: self._log_event,
+        }
+
+    async def start(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.socket_path))
+        os.makedirs(directory, mode=0o750, exist_ok=True)
+        if os.stat(directory).st_mode & stat.S_IWOTH:
+            logger.warning(f"Verifier socket directory {directory} is world-writable; use a private directory")
+        try:
+            # A previous daemon that died without cleanup leaves its socket behind
+            if stat.S_ISSOCK(os.stat(self.socket_path).st_mode):
+                os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+        except PermissionError as e:
+            raise AuthNexusError(
+                f"Cannot replace {self.socket_path}: it belongs to another user"
+            ) from e
+        self._server = await asyncio.start_unix_server(self._serve_client, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"Verifier daemon listening on {self.socket_path}")
+
+    async def close(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.close()
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        buffer = bytearray()
+        try:
+            while True:
+                chunk = await reader.read(_READ_SIZE)
+                if not chunk:
+                    break
+                buffer += chunk
+
+                responses = []
+                offset = 0
+                while len(buffer) - offset >= _FRAME.size:
+                    length, opcode, request_id = _FRAME.unpack_from(buffer, offset)
+                    if length > self.max_frame_size:
+                        raise ValueError(f"Frame of {length} bytes exceeds limit")
+                    end = offset + _FRAME.size + length
+                    if len(buffer) < end:
+                        break
+                    body = bytes(buffer[offset + _FRAME.size:end])
+                    responses.append(self._dispatch(opcode, request_id, body))
+                    offset = end
+                del buffer[:offset]
+
+                if responses:
+                    writer.write(b"".join(responses))
+                    await writer.drain()
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Dropping verifier client: {e}")
+        finally:
+            writer.close()
+
+    def _dispatch(self, opcode: int, request_id: int, body: bytes) -> bytes:
+        handler = self._handlers.get(opcode)
+        if handler is None:
+            return _encode_frame(STATUS_ERROR, request_id, f"Unknown opcode {opcode}".encode())
+        try:
+            status, result = handler(body)
+        except SecurityThresholdExceeded as e:
+            status, result = STATUS_REJECTED, str(e).encode()
+        except Exception as e:
+            logger.error(f"Verifier request failed: {e}")
+            status, result = STATUS_ERROR, str(e).encode()
+        return _encode_frame(status, request_id, result)
+
+    def _verify(self, body: bytes) -> Tuple[int, bytes]:
+        payload = self.auth.verify_token(body.decode())
+        if payload is None:
+            return STATUS_INVALID, b""
+        return STATUS_OK, _dumps(payload)
+
+    def _check_risk(self, body: bytes) -> Tuple[int, bytes]:
+        request = json.loads(body)
+        client_ip = request.get("client_ip", "")
+        user_agent = request.get("user_agent", "")
+        user_id = request.get("user_id")
+        risk_score = self.security_monitor.calculate_risk(client_ip, user_agent, user_id)
+        anomalous = self.security_monitor.check_anomalies(
+            {"client_ip": client_ip, "user_agent": user_agent, "user_id": user_id},
+            risk_score=risk_score
+        )
+        return STATUS_OK, _dumps({"risk_score": risk_score, "anomalous": anomalous})
+
+    def _log_event(self, body: bytes) -> Tuple[int, bytes]:
+        request = json.loads(body)
+        self.security_monitor.log_event(request["event_type"], request.get("metadata"))
+        return STATUS_OK, b""
+
+class VerifierClient:
+    """Blocking, thread-safe client for a VerifierDaemon
+
+    ``verify_token`` is a drop-in for ``AuthNexus.verify_token``. One
+    connection is kept open and re-established after a failure. Replies are
+    only trusted from a daemon running as root, as this process's user, or
+    as one of ``trusted_uids``.
+    """
+
+    def __init__(
+        self,
+        socket_path: Optional[str] = None,
+        timeout: float = 5.0,
+        trusted_uids: Optional[Collection[int]] = None,
+        pipeline_window: int = PIPELINE_WINDOW
+    ):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self.pipeline_window = pipeline_window
+        self.trusted_uids = frozenset((0, os.geteuid()) if trusted_uids is None else trusted_uids)
+        self._sock: Optional[socket.socket] = None
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def verify_token(self, token: str) -> Optional[dict]:
+        status, body = self._call([(OP_VERIFY, token.encode())])[0]
+        return self._verify_result(status, body)
+
+    def verify_many(self, tokens: Sequence[str]) -> List[Optional[dict]]:
+        """Verify tokens over pipelined round trips; rejected tokens also yield None"""
+        results = []
+        for status, body in self._call([(OP_VERIFY, token.encode()) for token in tokens]):
+            if status == STATUS_REJECTED:
+                results.append(None)
+            else:
+                results.append(self._verify_result(status, body))
+        return results
+
+    def check_risk(self, client_ip: str, user_agent: str, user_id: Optional[str] = None) -> dict:
+        """Risk score and anomaly verdict from the daemon's shared SecurityMonitor"""
+        request = {"client_ip": client_ip, "user_agent": user_agent, "user_id": user_id}
+        status, body = self._call([(OP_CHECK_RISK, _dumps(request))])[0]
+        self._raise_for_status(status, body)
+        return json.loads(body)
+
+    def log_event(self, event_type: str, metadata: Optional[dict] = None) -> None:
+        request = {"event_type": event_type, "metadata": metadata}
+        status, body = self._call([(OP_LOG_EVENT, _dumps(request))])[0]
+        self._raise_for_status(status, body)
+
+    def close(self) -> None:
+        with self._lock:
+            self._disconnect()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _verify_result(self, status: int, body: bytes) -> Optional[dict]:
+        if status == STATUS_INVALID:
+            return None
+        self._raise_for_status(status, body)
+        return json.loads(body)
+
+    @staticmethod
+    def _raise_for_status(status: int, body: bytes) -> None:
+        if status == STATUS_OK:
+            return
+        if status == STATUS_REJECTED:
+            raise SecurityThresholdExceeded(body.decode() or "Suspicious token activity")
+        raise AuthNexusError(f"Verifier daemon error: {body.decode()}")
+
+    def _call(self, requests: List[Tuple[int, bytes]]) -> List[Tuple[int, bytes]]:
+        with self._lock:
+            request_ids = []
+            frames = []
+            for opcode, body in requests:
+                self._next_id = (self._next_id + 1) & 0xFFFFFFFF
+                request_ids.append(self._next_id)
+                frames.append(_encode_frame(opcode, self._next_id, body))
+
+            try:
+                if self._sock is None:
+                    self._connect()
+                responses = {}
+                for window in self._windows(frames):
+                    # Each window's replies are read before the next is sent, so
+                    # neither side can block on a full buffer the other is not draining
+                    self._sock.sendall(b"".join(window))
+                    expected = len(responses) + len(window)
+                    while len(responses) < expected:
+                        length, status, request_id = _FRAME.unpack(self._recv_exactly(_FRAME.size))
+                        responses[request_id] = (status, self._recv_exactly(length))
+            except OSError as e:
+                self._disconnect()
+                raise AuthNexusError(f"Verifier daemon unavailable at {self.socket_path}: {e}") from e
+        return [responses[request_id] for request_id in request_ids]
+
+    def _windows(self, frames: List[bytes]) -> Iterator[List[bytes]]:
+        """Group frames into runs of at most pipeline_window bytes (one frame minimum)"""
+        window, size = [], 0
+        for frame in frames:
+            if window and size + len(frame) > self.pipeline_window:
+                yield window
+                window, size = [], 0
+            window.append(frame)
+            size += len(frame)
+        if window:
+            yield window
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_path)
+            uid = _peer_uid(sock, self.socket_path)
+        except OSError:
+            sock.close()
+            raise
+        if uid not in self.trusted_uids:
+            sock.close()
+            raise AuthNexusError(f"Refusing verifier at {self.socket_path}: served by untrusted uid {uid}")
+        self._sock = sock
+
+    def _disconnect(self) -> None:
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        self._buffer.clear()
+
+    def _recv_exactly(self, size: int) -> bytes:
+        buffer = self._buffer
+        while len(buffer) < size:
+            chunk = self._sock.recv(max(_READ_SIZE, size - len(buffer)))
+            if not chunk:
+                raise ConnectionError("Verifier daemon closed the connection")
+            buffer += chunk
+        data = bytes(buffer[:size])
+        del buffer[:size]
+        return data
@@ -0,0 +1,18 @@
+class AuthNexusError(Exception):
+    """Base class for all AuthNexus errors"""
+
+
+class InvalidTokenError(AuthNexusError):
+    """Token is malformed, expired, revoked or carries an invalid signature"""
+
+
+class TokenReuseDetected(InvalidTokenError):
+    """A rotated refresh token was presented again; its family is revoked"""
+
+
+class SecurityThresholdExceeded(AuthNexusError):
+    """Request risk exceeded the configured security policy"""
+
+
+class CredentialVerificationError(AuthNexusError):
+    """WebAuthn credential could not be verified"""
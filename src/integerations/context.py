@@ -0,0 +1,76 @@
+from typing import Optional
+from ..exceptions import SecurityThresholdExceeded
+
+_UNSET = object()
+
+class AuthContext:
+    """Request-scoped, memoized authentication state shared by the framework adapters
+
+    Token payload, risk score and anomaly verdict are each computed at most
+    once per request, and only when a protected route first asks for them.
+    """
+
+    __slots__ = (
+        "_auth",
+        "_monitor",
+        "token",
+        "client_ip",
+        "user_agent",
+        "_payload",
+        "_error",
+        "_risk_score",
+        "_anomalous",
+    )
+
+    def __init__(
+        self,
+        auth,
+        security_monitor,
+        token: Optional[str],
+        client_ip: Optional[str],
+        user_agent: Optional[str]
+    ):
+        self._auth = auth
+        self._monitor = security_monitor
+        self.token = token
+        self.client_ip = client_ip or ""
+        self.user_agent = user_agent or ""
+        self._payload = _UNSET
+        self._error: Optional[SecurityThresholdExceeded] = None
+        self._risk_score = _UNSET
+        self._anomalous = _UNSET
+
+    @property
+    def payload(self) -> Optional[dict]:
+        """Verified token claims, or None for a missing or invalid token"""
+        if self._payload is _UNSET:
+            try:
+                self._payload = self._auth.verify_token(self.token) if self.token else None
+            except SecurityThresholdExceeded as e:
+                self._payload = None
+                self._error = e
+        if self._error is not None:
+            raise self._error
+        return self._payload
+
+    @property
+    def risk_score(self) -> float:
+        if self._risk_score is _UNSET:
+            # Use the subject for per-user signals only if the token was already verified
+            payload = self._payload if isinstance(self._payload, dict) else None
+            self._risk_score = self._monitor.calculate_risk(
+                self.client_ip,
+                self.user_agent,
+                user_id=payload.get("sub") if payload else None
+            )
+        return self._risk_score
+
+    @property
+    def anomalous(self) -> bool:
+        """Anomaly verdict, reusing the memoized risk score"""
+        if self._anomalous is _UNSET:
+            self._anomalous = self._monitor.check_anomalies(
+                {"client_ip": self.client_ip, "user_agent": self.user_agent},
+                risk_score=self.risk_score
+            )
+        return self._anomalous
@@ -9,6 +9,7 @@ from ..exceptions import (
     SecurityThresholdExceeded,
     CredentialVerificationError
 )
+from .context import AuthContext
 
 class AuthNexusFastAPIConfig(BaseModel):
     """Professional configuration model for FastAPI integration"""
@@ -38,12 +39,14 @@ class AuthNexusFastAPI:
                 raise HTTPException(401, "Missing authorization header")
             return None
 
+        ctx = self.get_auth_context(request, credentials.credentials)
         try:
-            token = credentials.credentials
-            payload = await run_in_threadpool(self.auth.verify_token, token)
+            payload = await run_in_threadpool(lambda: ctx.payload)
+            if payload is None:
+                raise InvalidTokenError("Invalid token")
             
             # Security monitoring hook
-            await self._check_request_security(request, payload)
+            await self._check_request_security(request, ctx)
             
             return payload
         except InvalidTokenError as e:
@@ -51,18 +54,26 @@ class AuthNexusFastAPI:
         except SecurityThresholdExceeded as e:
             raise HTTPException(403, str(e)) from e
 
-    async def _check_request_security(self, request: Request, payload: Dict):
+    def get_auth_context(self, request: Request, token: Optional[str] = None) -> AuthContext:
+        """Request-scoped auth context, also available to handlers as ``request.state.authnexus``"""
+        ctx = getattr(request.state, "authnexus", None)
+        if ctx is None:
+            ctx = request.state.authnexus = AuthContext(
+                self.auth,
+                self.auth.security_monitor,
+                token=token,
+                client_ip=request.client.host if request.client else None,
+                user_agent=request.headers.get("user-agent")
+            )
+        return ctx
+
+    async def _check_request_security(self, request: Request, ctx: AuthContext):
         """Enterprise-grade security checks"""
+        # The anomaly verdict reuses the memoized risk score
+        anomalies = await run_in_threadpool(lambda: ctx.anomalous)
         security_report = {
-            "risk_score": self.auth.security_monitor.calculate_risk(
-                client_ip=request.client.host,
-                user_agent=request.headers.get("user-agent"),
-                user_context=payload
-            ),
-            "anomalies": await run_in_threadpool(
-                self.auth.security_monitor.check_anomalies,
-                payload
-            )
+            "risk_score": ctx.risk_score,
+            "anomalies": anomalies
         }
 
         request.state.security_report = security_report
@@ -1,8 +1,9 @@
 from typing import Optional, Dict, Any, Callable
-from flask import Flask, Request, current_app, Blueprint, jsonify
+from flask import Flask, Request, current_app, Blueprint, jsonify, g, request
 from werkzeug.exceptions import Unauthorized, Forbidden
 from ..core import AuthNexus, SecurityMonitor, WebAuthnManager
 from ..exceptions import InvalidTokenError, SecurityThresholdExceeded
+from .context import AuthContext
 
 class AuthNexusFlask:
     """Professional Flask integration for AuthNexus"""
@@ -29,8 +30,7 @@ class AuthNexusFlask:
         self.webauthn = self.auth.webauthn
         self.security_monitor = self.auth.security_monitor
         
-        # Register middleware and blueprints
-        app.before_request(self._security_middleware)
+        # Register blueprints; security state is computed lazily per request
         app.register_blueprint(self._create_auth_blueprint())
 
     def _create_auth_blueprint(self) -> Blueprint:
@@ -58,10 +58,14 @@ class AuthNexusFlask:
     def token_required(self, f: Callable) -> Callable:
         """Professional decorator for token-protected routes"""
         def wrapper(*args, **kwargs):
-            token = self._get_token_from_request()
+            ctx = self.auth_context
+            if ctx.token is None:
+                raise Unauthorized("Missing or invalid authorization header")
             try:
-                user = self.auth.verify_token(token)
-                if self.security_monitor.check_anomalies(user):
+                user = ctx.payload
+                if user is None:
+                    raise InvalidTokenError()
+                if ctx.anomalous:
                     raise SecurityThresholdExceeded()
                 return f(user=user, *args, **kwargs)
             except InvalidTokenError:
@@ -70,20 +74,27 @@ class AuthNexusFlask:
                 raise Forbidden("Security policy violated")
         return wrapper
 
-    def _get_token_from_request(self) -> str:
+    @property
+    def auth_context(self) -> AuthContext:
+        """Request-scoped auth context, also available to handlers as ``g.authnexus``"""
+        ctx = g.get('authnexus')
+        if ctx is None:
+            ctx = g.authnexus = AuthContext(
+                self.auth,
+                self.security_monitor,
+                token=self._get_token_from_request(),
+                client_ip=request.remote_addr,
+                user_agent=request.headers.get('User-Agent')
+            )
+        return ctx
+
+    def _get_token_from_request(self) -> Optional[str]:
         """Professional token extraction"""
         auth_header = request.headers.get('Authorization', '')
         if not auth_header.startswith('Bearer '):
-            raise Unauthorized("Missing or invalid authorization header")
+            return None
         return auth_header.split(' ')[1]
 
-    def _security_middleware(self):
-        """Professional security middleware"""
-        request.environ['authnexus.risk_score'] = self.security_monitor.calculate_risk(
-            client_ip=request.remote_addr,
-            user_agent=request.headers.get('User-Agent')
-        )
-
     @property
     def rate_limiter(self) -> Callable:
         """Professional rate limiting decorator"""
@@ -40,7 +40,7 @@ class TestTokenAuthentication:
     def test_security_threshold(self, auth_client, mocker):
         """Test security policy enforcement"""
         mocker.patch(
-            "authnexus.core.security_monitor.SecurityMonitor.check_anomalies",
+            "authnexus.core.auth_manager.TokenAnomalyDetector.check_anomalies",
             return_value=True
         )
         token = auth_client.create_token("user123")
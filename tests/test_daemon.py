@@ -0,0 +1,89 @@
+import os
+import asyncio
+import threading
+import pytest
+from authnexus import SecurityMonitor, SecurityThresholdExceeded
+from authnexus.cli import main
+from authnexus.core.auth_manager import AuthNexus, AuthConfig
+from authnexus.exceptions import AuthNexusError
+from authnexus.core.verifier_daemon import VerifierDaemon, VerifierClient
+
+@pytest.fixture
+def auth():
+    return AuthNexus(AuthConfig(secret_key="test-secret-key-1234"))
+
+@pytest.fixture
+def daemon(auth, tmp_path):
+    daemon = VerifierDaemon(auth, SecurityMonitor(), socket_path=str(tmp_path / "verifier.sock"))
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(daemon.start())
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield daemon
+    asyncio.run_coroutine_threadsafe(daemon.close(), loop).result(timeout=5)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+@pytest.fixture
+def client(daemon):
+    with VerifierClient(daemon.socket_path) as client:
+        yield client
+
+class TestVerifierDaemon:
+    def test_verify_matches_in_process(self, auth, client):
+        """Test daemon verification returns the same payload as AuthNexus"""
+        token = auth.create_token("user123", {"role": "admin"})
+        assert client.verify_token(token) == auth.verify_token(token)
+        assert client.verify_token(token + "x") is None
+
+    def test_pipelined_batch(self, auth, client):
+        """Test many tokens are answered in order over one round trip"""
+        tokens = [auth.create_token(f"user{i}", {}) for i in range(50)]
+        tokens[7] = "not-a-token"
+        results = client.verify_many(tokens)
+        assert results[7] is None
+        assert [r["sub"] for i, r in enumerate(results) if i != 7] == [
+            f"user{i}" for i in range(50) if i != 7
+        ]
+
+    def test_large_batch_does_not_deadlock(self, auth, client):
+        """Test a batch far larger than the socket buffers completes"""
+        token = auth.create_token("user123", {"role": "admin"})
+        results = client.verify_many([token] * 20000)
+        assert len(results) == 20000
+        assert all(result["sub"] == "user123" for result in results)
+
+    def test_rejection_raises(self, auth, client, mocker):
+        """Test anomaly rejections surface as SecurityThresholdExceeded"""
+        mocker.patch.object(auth.token_anomalies, "check_anomalies", return_value=True)
+        with pytest.raises(SecurityThresholdExceeded):
+            client.verify_token(auth.create_token("user123", {}))
+
+    def test_shared_risk_state(self, daemon, client):
+        """Test events logged by one client raise risk seen by another"""
+        baseline = client.check_risk("10.0.11.1", "ua")["risk_score"]
+        for _ in range(5):
+            client.log_event("login_failure", {"ip": "10.0.11.1", "user_agent": "ua"})
+        with VerifierClient(daemon.socket_path) as other:
+            assert other.check_risk("10.0.11.1", "ua")["risk_score"] > baseline
+
+    def test_untrusted_daemon_refused(self, auth, daemon):
+        """Test the client will not trust a daemon run by another user"""
+        client = VerifierClient(daemon.socket_path, trusted_uids={os.geteuid() + 1})
+        with pytest.raises(AuthNexusError):
+            client.verify_token(auth.create_token("user123", {}))
+
+    def test_serve_shares_one_monitor(self, monkeypatch, mocker, tmp_path):
+        """Test the serve command hands the same SecurityMonitor to AuthNexus and the daemon"""
+        monkeypatch.setenv("AUTH_SECRET", "test-secret-key-1234")
+        daemon_cls = mocker.patch("authnexus.core.verifier_daemon.VerifierDaemon")
+        mocker.patch("authnexus.cli.asyncio.run", side_effect=lambda coro: coro.close())
+        assert main(["serve", "--socket", str(tmp_path / "verifier.sock")]) == 0
+        (auth,), kwargs = daemon_cls.call_args
+        assert auth.security_monitor is kwargs["security_monitor"]
+
+    def test_serve_requires_secret(self, monkeypatch):
+        """Test the serve command refuses to start without a signing secret"""
+        monkeypatch.delenv("AUTH_SECRET", raising=False)
+        assert main(["serve"]) == 2
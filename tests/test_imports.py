@@ -0,0 +1,36 @@
+import subprocess
+import sys
+
+def _import_profile(statement: str):
+    """Run a statement under -X importtime; return loaded modules and cumulative import times"""
+    result = subprocess.run(
+        [
+            sys.executable, "-X", "importtime", "-c",
+            f"{statement}\nimport sys\nprint('\\n'.join(sys.modules))"
+        ],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        timings[name.strip()] = int(cumulative)
+    return set(result.stdout.split()), timings
+
+class TestColdStart:
+    def test_package_import_is_lazy(self):
+        """Test importing the package loads no heavy dependencies"""
+        modules, timings = _import_profile("import authnexus")
+        for heavy in ("jwt", "pydantic", "webauthn", "cryptography", "flask", "fastapi"):
+            assert heavy not in modules
+        assert timings["authnexus"] < 100_000
+
+    def test_token_verification_skips_webauthn(self):
+        """Test AuthNexus can be imported without WebAuthn or integrations"""
+        modules, _ = _import_profile("from authnexus import AuthNexus")
+        assert "authnexus.core.auth_manager" in modules
+        for heavy in ("webauthn", "authnexus.core.webauthn", "flask", "fastapi"):
+            assert heavy not in modules
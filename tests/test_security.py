@@ -1,6 +1,16 @@
+import os
+import json
 import time
+import multiprocessing
 import pytest
 from authnexus import SecurityMonitor, SecurityConfig
+from authnexus.core.auth_manager import AuthNexus, AuthConfig
+from authnexus.core.shared_state import SharedProfileTable
+from authnexus.core.risk_rules import compile_user_agent_matcher
+from authnexus.core.geoip import GeoIPResolver
+from authnexus.core.sketches import WindowedDistinctSketch
+from authnexus.core.snapshot import write_snapshot
+from authnexus.integerations.context import AuthContext
 
 @pytest.fixture
 def security_monitor():
@@ -85,3 +95,401 @@ class TestSecurityMonitoring:
             "client_ip": "1.2.3.4",
             "user_agent": "normal-client"
         }) is True
+
+class TestSharedProfiles:
+    def test_counters_shared_across_forked_workers(self):
+        """Test lockout counters recorded in a worker are visible to the master"""
+        table = SharedProfileTable(capacity=128)
+        monitor = SecurityMonitor(
+            config=SecurityConfig(max_failed_attempts=3),
+            shared_profiles=table
+        )
+        try:
+            ctx = multiprocessing.get_context("fork")
+            worker = ctx.Process(target=_log_failures, args=(monitor, "10.0.0.9", 3))
+            worker.start()
+            worker.join(timeout=10)
+            assert worker.exitcode == 0
+            assert table.get("10.0.0.9_worker-agent")[0] == 3
+            assert monitor.calculate_risk("10.0.0.9", "worker-agent") >= 0.4
+            assert monitor.risk_profiles == {}
+        finally:
+            table.close()
+
+    def test_table_full_falls_back_to_local_profiles(self):
+        """Test a saturated table degrades to per-process profiles"""
+        table = SharedProfileTable(capacity=2)
+        monitor = SecurityMonitor(shared_profiles=table)
+        try:
+            for i in range(3):
+                monitor.log_event("login_failure", {"ip": f"10.0.1.{i}", "user_agent": "ua"})
+            assert len(monitor.risk_profiles) == 1
+        finally:
+            table.close()
+
+    def test_stale_slots_are_reclaimed(self):
+        """Test new keys take over slots idle past the TTL instead of falling back"""
+        table = SharedProfileTable(capacity=2, ttl=60)
+        try:
+            assert table.record("old-a", True, 1000.0)
+            assert table.record("old-b", True, 1000.0)
+            assert not table.record("fresh", True, 1030.0)
+            assert table.record("fresh", True, 1100.0)
+            assert table.get("fresh") == (1, 1100.0)
+            assert table.stats == {"capacity": 2, "used": 2, "reclaimed": 1, "fallbacks": 1}
+        finally:
+            table.close()
+
+def _log_failures(monitor, ip, count):
+    for _ in range(count):
+        monitor.log_event("login_failure", {"ip": ip, "user_agent": "worker-agent"})
+
+class TestRiskPolicy:
+    def test_policy_file_replaces_builtin_rules(self, tmp_path):
+        """Test rules are loaded from the security policy file"""
+        policy = tmp_path / "policy.json"
+        policy.write_text(json.dumps({
+            "rules": [{"type": "user_agent", "weight": 0.9, "patterns": ["curl", "python-requests"]}]
+        }))
+        monitor = SecurityMonitor(config=SecurityConfig(policy_path=str(policy)))
+        assert monitor.calculate_risk("10.0.2.1", "Python-Requests/2.31") == pytest.approx(0.9)
+        assert monitor.calculate_risk("10.0.2.1", "Mozilla/5.0") == 0.0
+
+    def test_hot_reload(self, tmp_path):
+        """Test policy changes are picked up without restarting"""
+        policy = tmp_path / "policy.json"
+        policy.write_text(json.dumps({"rules": [{"type": "user_agent", "weight": 0.5, "patterns": ["bot"]}]}))
+        monitor = SecurityMonitor(config=SecurityConfig(policy_path=str(policy)))
+        assert monitor.calculate_risk("10.0.2.2", "evilbot") == pytest.approx(0.5)
+
+        policy.write_text(json.dumps({"rules": [{"type": "user_agent", "weight": 0.7, "patterns": ["bot"]}]}))
+        os.utime(policy, (time.time() + 10, time.time() + 10))
+        assert monitor.policy.reload_if_changed() is True
+        assert monitor.calculate_risk("10.0.2.2", "evilbot") == pytest.approx(0.7)
+
+    def test_broken_reload_logged_once(self, tmp_path, mocker):
+        """Test an invalid policy edit is reported once and the old policy kept"""
+        policy = tmp_path / "policy.json"
+        policy.write_text(json.dumps({"rules": [{"type": "user_agent", "weight": 0.5, "patterns": ["bot"]}]}))
+        monitor = SecurityMonitor(config=SecurityConfig(policy_path=str(policy)))
+        logger = mocker.patch("authnexus.core.risk_rules.logger")
+
+        policy.write_text("{not json")
+        os.utime(policy, (time.time() + 10, time.time() + 10))
+        assert monitor.policy.reload_if_changed() is False
+        assert monitor.policy.reload_if_changed() is False
+        assert logger.error.call_count == 1
+        assert monitor.calculate_risk("10.0.2.2", "evilbot") == pytest.approx(0.5)
+
+    def test_env_paths_read_at_construction(self, tmp_path, monkeypatch):
+        """Test path settings pick up environment changes made after import"""
+        monkeypatch.setenv("AUTHNEXUS_SECURITY_POLICY", str(tmp_path / "policy.yml"))
+        monkeypatch.setenv("AUTHNEXUS_GEOIP_DATABASE", str(tmp_path / "city.mmdb"))
+        monkeypatch.setenv("AUTHNEXUS_SNAPSHOT_PATH", str(tmp_path / "monitor.snap"))
+        config = SecurityConfig()
+        assert config.policy_path == str(tmp_path / "policy.yml")
+        assert config.geoip_database == str(tmp_path / "city.mmdb")
+        assert config.snapshot_path == str(tmp_path / "monitor.snap")
+
+    def test_unavailable_geoip_disabled_once(self, tmp_path, mocker):
+        """Test a bad GeoIP database is reported at construction, not per request"""
+        logger = mocker.patch("authnexus.core.security_monitor.logger")
+        monitor = SecurityMonitor(config=SecurityConfig(geoip_database=str(tmp_path / "missing.mmdb")))
+        assert monitor.geoip is None
+        assert logger.error.call_count == 1
+
+        monitor.log_event("login_success", {"ip": "10.0.2.3", "user_agent": "ua", "user_id": "alice"})
+        monitor.calculate_risk("10.0.2.3", "ua", "alice")
+        assert logger.error.call_count == 1
+
+    def test_user_agent_patterns_share_one_regex(self):
+        """Test substring patterns fold into a single case-insensitive matcher"""
+        matcher = compile_user_agent_matcher(["bot", "botnet", "crawler", "curl"], ["^$"])
+        assert matcher.search("Googlebot/2.1")
+        assert matcher.search("CURL/8.0")
+        assert matcher.search("")
+        assert not matcher.search("Mozilla/5.0 (X11; Linux x86_64)")
+
+class TestAuthContext:
+    def test_security_state_computed_once(self, security_monitor, mocker):
+        """Test payload, risk and anomaly verdict are memoized per request"""
+        auth = mocker.Mock()
+        auth.verify_token.return_value = {"sub": "user123"}
+        risk = mocker.spy(security_monitor, "calculate_risk")
+        ctx = AuthContext(auth, security_monitor, "token", "10.0.3.1", "test-agent")
+
+        for _ in range(3):
+            assert ctx.payload == {"sub": "user123"}
+            assert ctx.anomalous is False
+            assert ctx.risk_score == 0.0
+        auth.verify_token.assert_called_once_with("token")
+        assert risk.call_count == 1
+
+    def test_nothing_computed_until_needed(self, security_monitor, mocker):
+        """Test unauthenticated requests pay for no security work"""
+        auth = mocker.Mock()
+        risk = mocker.spy(security_monitor, "calculate_risk")
+        ctx = AuthContext(auth, security_monitor, None, "10.0.3.2", "test-agent")
+        assert ctx.payload is None
+        auth.verify_token.assert_not_called()
+        assert risk.call_count == 0
+
+    def test_context_built_like_adapters(self):
+        """Test the context works with the monitor the framework adapters pass in"""
+        auth = AuthNexus(AuthConfig(secret_key="test-secret-key-1234"))
+        token = auth.create_token("user123", {})
+        ctx = AuthContext(auth, auth.security_monitor, token, "10.0.3.3", "test-agent")
+        assert ctx.payload["sub"] == "user123"
+        assert ctx.risk_score == 0.0
+        assert ctx.anomalous is False
+
+        auth.security_monitor.log_event("login_failure", {"ip": "10.0.3.3", "user_agent": "test-agent"})
+        fresh = AuthContext(auth, auth.security_monitor, token, "10.0.3.3", "test-agent")
+        assert fresh.risk_score > 0.0
+
+class _StaticGeoReader:
+    """In-memory stand-in for a MaxMind database reader"""
+    def __init__(self, records):
+        self.records = records
+        self.lookups = 0
+
+    def get(self, ip):
+        self.lookups += 1
+        return self.records.get(ip)
+
+@pytest.fixture
+def geo_reader():
+    return _StaticGeoReader({
+        "81.2.69.142": {"location": {"latitude": 51.5, "longitude": -0.12}, "country": {"iso_code": "GB"}},
+        "1.0.16.1": {"location": {"latitude": 35.68, "longitude": 139.69}, "country": {"iso_code": "JP"}},
+        "81.2.69.160": {"location": {"latitude": 51.52, "longitude": -0.1}, "country": {"iso_code": "GB"}},
+    })
+
+class TestImpossibleTravel:
+    def test_impossible_travel_detected(self, geo_reader):
+        """Test a login from the other side of the world minutes later is flagged"""
+        monitor = SecurityMonitor(geoip=GeoIPResolver(reader=geo_reader))
+        monitor.log_event("login_success", {"ip": "81.2.69.142", "user_agent": "ua", "user_id": "alice"})
+        baseline = monitor.calculate_risk("81.2.69.160", "ua", user_id="alice")
+        assert monitor.calculate_risk("1.0.16.1", "ua", user_id="alice") == pytest.approx(baseline + 0.3)
+
+    def test_location_ring_is_bounded(self, geo_reader):
+        """Test location history and the lookup cache have fixed size"""
+        resolver = GeoIPResolver(reader=geo_reader, cache_size=2)
+        monitor = SecurityMonitor(config=SecurityConfig(location_history_size=3), geoip=resolver)
+        for ip in ["81.2.69.142", "1.0.16.1", "81.2.69.160"] * 3:
+            monitor.log_event("login_success", {"ip": ip, "user_agent": "ua", "user_id": "bob"})
+        assert len(monitor.location_history("bob")) == 3
+        assert len(resolver._cache) == 2
+        resolver.lookup("81.2.69.160")
+        lookups = geo_reader.lookups
+        resolver.lookup("81.2.69.160")
+        assert geo_reader.lookups == lookups
+
+@pytest.fixture
+def stuffing_monitor(tmp_path):
+    policy = tmp_path / "policy.json"
+    policy.write_text(json.dumps({"rules": [
+        {"type": "distinct_users_per_ip", "weight": 0.4},
+        {"type": "distinct_ips_per_user", "weight": 0.3},
+        {"type": "failure_rate", "key": "user", "weight": 0.3},
+    ]}))
+    return SecurityMonitor(config=SecurityConfig(policy_path=str(policy)))
+
+class TestCredentialStuffing:
+    def test_rules_off_by_default(self, security_monitor):
+        """Test the sketch rules are opt-in"""
+        for i in range(40):
+            security_monitor.log_event("login_failure", {
+                "ip": "10.0.4.2",
+                "user_agent": f"agent-{i}",
+                "user_id": f"user{i}"
+            })
+        assert security_monitor.calculate_risk("10.0.4.2", "fresh-agent") == 0.0
+
+    def test_password_spray_from_one_ip(self, stuffing_monitor):
+        """Test one IP cycling through many accounts is flagged"""
+        for i in range(40):
+            stuffing_monitor.log_event("login_failure", {
+                "ip": "10.0.4.1",
+                "user_agent": f"agent-{i}",
+                "user_id": f"user{i}"
+            })
+        assert stuffing_monitor.users_per_ip.estimate("10.0.4.1", time.time()) >= 20
+        assert stuffing_monitor.calculate_risk("10.0.4.1", "fresh-agent") >= 0.4
+
+    def test_distributed_attack_on_one_account(self, stuffing_monitor):
+        """Test one account hit from many IPs is flagged"""
+        for i in range(30):
+            stuffing_monitor.log_event("login_failure", {
+                "ip": f"172.16.{i}.1",
+                "user_agent": "ua",
+                "user_id": "victim"
+            })
+        now = time.time()
+        assert stuffing_monitor.ips_per_user.estimate("victim", now) >= 10
+        assert stuffing_monitor.failure_counts.estimate("user:victim", now) >= 30
+        assert stuffing_monitor.calculate_risk("192.168.9.9", "ua", user_id="victim") >= 0.6
+
+    def test_benign_volume_does_not_flag_fresh_keys(self, stuffing_monitor):
+        """Test collision noise from heavy benign traffic is not scored"""
+        for i in range(30000):
+            stuffing_monitor.log_event("login_success" if i % 10 else "login_failure", {
+                "ip": f"10.{i // 65536}.{i // 256 % 256}.{i % 256}",
+                "user_agent": "ua",
+                "user_id": f"user{i}"
+            })
+        now = time.time()
+        assert stuffing_monitor.users_per_ip.estimate("203.0.113.7", now) > 20
+        assert stuffing_monitor.calculate_risk("203.0.113.7", "ua", user_id="newcomer") == 0.0
+
+    def test_sketch_memory_is_fixed(self):
+        """Test sketch memory does not grow with attack size"""
+        sketch = WindowedDistinctSketch(window=60, buckets=2, width=64, depth=2, precision=4)
+        size = sketch.nbytes
+        for i in range(2000):
+            sketch.add(f"user{i % 50}", f"ip{i}", 1000.0)
+        assert sketch.nbytes == size
+        assert sketch.estimate("user1", 1000.0) > 0
+        assert sketch.estimate("user1", 1200.0) == 0.0
+
+class TestSnapshots:
+    def test_round_trip(self, tmp_path):
+        """Test profiles and events survive a save/load cycle"""
+        path = str(tmp_path / "monitor.snap")
+        monitor = SecurityMonitor()
+        monitor.log_event("login_failure", {"ip": "10.0.5.1", "user_agent": "ua", "user_id": "carol"})
+        monitor.log_event("login_failure", {"ip": "10.0.5.1", "user_agent": "ua"})
+        monitor.risk_profiles["user:carol"] = monitor.risk_profiles["10.0.5.1_ua"].model_copy()
+        monitor.risk_profiles["user:carol"].ip_address = None
+        monitor.risk_profiles["user:carol"].locations.append((51.5, -0.12, time.time()))
+        monitor.save_snapshot(path)
+
+        restored = SecurityMonitor()
+        assert restored.load_snapshot(path) == 2
+        assert restored._get_or_create_profile("10.0.5.1", "ua").failed_attempts == 2
+        assert list(restored.location_history("carol"))[0][:2] == (51.5, -0.12)
+        assert restored.risk_profiles["user:carol"].ip_address is None
+        assert [event.event_type for event in restored.events] == ["login_failure", "login_failure"]
+        assert restored.events[0].metadata["user_id"] == "carol"
+
+    def test_stale_entries_dropped(self, tmp_path):
+        """Test profiles and events older than max_age are not restored"""
+        path = str(tmp_path / "monitor.snap")
+        monitor = SecurityMonitor()
+        monitor.log_event("login_failure", {"ip": "10.0.6.1", "user_agent": "ua"})
+        monitor.risk_profiles["10.0.6.1_ua"].last_attempt -= 7200
+        monitor.events[0].timestamp -= 7200
+        monitor.log_event("login_failure", {"ip": "10.0.6.2", "user_agent": "ua"})
+        monitor.save_snapshot(path)
+
+        restored = SecurityMonitor()
+        assert restored.load_snapshot(path, max_age=3600) == 1
+        assert len(restored.events) == 1
+        assert restored._get_or_create_profile("10.0.6.1", "ua").failed_attempts == 0
+
+    def test_restored_profiles_checkpoint_again(self, tmp_path):
+        """Test untouched restored profiles are carried into the next snapshot"""
+        first, second = str(tmp_path / "a.snap"), str(tmp_path / "b.snap")
+        monitor = SecurityMonitor()
+        monitor.log_event("login_failure", {"ip": "10.0.7.1", "user_agent": "ua"})
+        monitor.save_snapshot(first)
+
+        restored = SecurityMonitor()
+        restored.load_snapshot(first)
+        assert not restored.risk_profiles
+        restored.save_snapshot(second)
+
+        again = SecurityMonitor(config=SecurityConfig(snapshot_path=second))
+        assert again.calculate_risk("10.0.7.1", "ua") > 0
+
+    def test_million_profile_restore_under_budget(self, tmp_path):
+        """Test a 1M-profile snapshot restores well under a second"""
+        path = str(tmp_path / "large.snap")
+        now = time.time()
+        write_snapshot(path, [(f"10.{i >> 16}.{(i >> 8) & 255}.{i & 255}_ua", 1, now, ()) for i in range(1_000_000)], [])
+
+        monitor = SecurityMonitor()
+        start = time.perf_counter()
+        assert monitor.load_snapshot(path) == 1_000_000
+        assert time.perf_counter() - start < 0.5
+        assert monitor._get_or_create_profile("10.3.2.1", "ua").failed_attempts == 1
+
+    def test_rejects_foreign_file(self, tmp_path):
+        """Test a non-snapshot file is refused"""
+        path = tmp_path / "bogus.snap"
+        path.write_bytes(b"not a snapshot at all, definitely not")
+        with pytest.raises(ValueError):
+            SecurityMonitor().load_snapshot(str(path))
+
+    def test_truncated_file_rejected(self, tmp_path, monkeypatch):
+        """Test a snapshot cut short at any point is refused, not crashed on"""
+        path = tmp_path / "monitor.snap"
+        monitor = SecurityMonitor()
+        monitor.log_event("login_failure", {"ip": "10.0.8.1", "user_agent": "ua", "user_id": "dave"})
+        monitor.save_snapshot(str(path))
+        data = path.read_bytes()
+
+        for size in (0, 6, 30, len(data) // 2, len(data) - 1):
+            path.write_bytes(data[:size])
+            with pytest.raises(ValueError, match="Corrupt snapshot"):
+                SecurityMonitor().load_snapshot(str(path))
+
+        path.write_bytes(data[:6])
+        monkeypatch.setenv("AUTHNEXUS_SNAPSHOT_PATH", str(path))
+        auth = AuthNexus(AuthConfig(secret_key="test-secret-key-1234"))
+        assert auth.security_monitor.calculate_risk("10.0.8.1", "ua") == 0.0
+
+class TestProfileEviction:
+    def test_profile_count_is_capped(self):
+        """Test rotating user agents cannot grow profiles past the cap"""
+        monitor = SecurityMonitor(config=SecurityConfig(max_profiles=50))
+        for i in range(500):
+            monitor.calculate_risk("10.0.8.1", f"scanner-{i}")
+        assert len(monitor.risk_profiles) == 50
+        assert monitor.eviction_stats["evicted_idle"] == 450
+
+    def test_idle_profiles_evicted_before_active(self):
+        """Test idle failure-free profiles go before recently used ones"""
+        monitor = SecurityMonitor(config=SecurityConfig(max_profiles=3))
+        monitor.log_event("login_success", {"ip": "10.0.9.1", "user_agent": "ua"})
+        monitor.log_event("login_success", {"ip": "10.0.9.2", "user_agent": "ua"})
+        monitor.log_event("login_success", {"ip": "10.0.9.3", "user_agent": "ua"})
+        monitor.risk_profiles["10.0.9.2_ua"].last_attempt -= 7200
+        monitor.calculate_risk("10.0.9.4", "ua")
+        assert "10.0.9.2_ua" not in monitor.risk_profiles
+        assert "10.0.9.1_ua" in monitor.risk_profiles
+        assert monitor.eviction_stats["evicted_idle"] == 1
+
+    def test_failing_profiles_survive_flood(self):
+        """Test an attacker cannot flush their own lockout state"""
+        monitor = SecurityMonitor(config=SecurityConfig(max_profiles=20))
+        for _ in range(5):
+            monitor.log_event("login_failure", {"ip": "10.0.10.1", "user_agent": "attacker"})
+        for i in range(1000):
+            monitor.calculate_risk(f"10.1.{i // 250}.{i % 250}", "flood")
+        assert monitor.risk_profiles["10.0.10.1_attacker"].failed_attempts == 5
+        assert len(monitor.risk_profiles) == 20
+        assert monitor.generate_report()["profile_cache"]["evicted_idle"] > 0
+
+    def test_cap_holds_under_failing_flood(self):
+        """Test failures from rotating user agents cannot push profiles past the cap"""
+        monitor = SecurityMonitor(config=SecurityConfig(max_profiles=100))
+        for _ in range(5):
+            monitor.log_event("login_failure", {"ip": "10.0.12.1", "user_agent": "attacker"})
+        for i in range(5000):
+            monitor.log_event("login_failure", {"ip": "10.0.12.2", "user_agent": f"agent-{i}"})
+        assert len(monitor.risk_profiles) <= 100
+        assert monitor.risk_profiles["10.0.12.1_attacker"].failed_attempts == 5
+
+    def test_weakest_protected_profile_evicted_when_all_protected(self):
+        """Test a table full of failing profiles evicts the one with fewest failures"""
+        monitor = SecurityMonitor(config=SecurityConfig(max_profiles=3))
+        for ip, failures in (("10.0.13.1", 4), ("10.0.13.2", 2), ("10.0.13.3", 3)):
+            for _ in range(failures):
+                monitor.log_event("login_failure", {"ip": ip, "user_agent": "ua"})
+        for _ in range(2):
+            monitor.log_event("login_failure", {"ip": "10.0.13.4", "user_agent": "ua"})
+        assert "10.0.13.2_ua" not in monitor.risk_profiles
+        assert len(monitor.risk_profiles) == 3
+        assert monitor.eviction_stats["evicted_protected"] >= 1
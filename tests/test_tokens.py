@@ -0,0 +1,142 @@
+import time
+import pytest
+from authnexus.exceptions import InvalidTokenError, TokenReuseDetected
+from authnexus.core.refresh_tokens import (
+    RefreshTokenManager,
+    RefreshTokenStore,
+    InMemoryRefreshTokenStore,
+    SQLiteRefreshTokenStore,
+    RedisRefreshTokenStore
+)
+from authnexus.core.token_verifier import FastTokenVerifier
+
+class _FakeRedisPipeline:
+    def __init__(self, client):
+        self._client = client
+        self._commands = []
+
+    def hset(self, key, mapping):
+        self._commands.append(lambda: self._client.hashes.setdefault(key, {}).update(mapping))
+
+    def sadd(self, key, member):
+        self._commands.append(lambda: self._client.sets.setdefault(key, set()).add(member))
+
+    def expireat(self, key, when):
+        pass
+
+    def execute(self):
+        for command in self._commands:
+            command()
+
+class _FakeRedis:
+    """Just enough of redis.Redis for RedisRefreshTokenStore, returning bytes like the real client"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.sets = {}
+
+    def register_script(self, script):
+        def mark_used(keys):
+            data = self.hashes.get(keys[0])
+            if data is None or "used" in data:
+                return 0
+            data["used"] = "1"
+            return 1
+        return mark_used
+
+    def pipeline(self):
+        return _FakeRedisPipeline(self)
+
+    def hgetall(self, key):
+        return {k.encode(): v.encode() for k, v in self.hashes.get(key, {}).items()}
+
+    def smembers(self, key):
+        return {m.encode() for m in self.sets.get(key, set())}
+
+    def delete(self, *keys):
+        removed = 0
+        for key in keys:
+            removed += (self.hashes.pop(key, None) is not None) + (self.sets.pop(key, None) is not None)
+        return removed
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def refresh_manager(request):
+    if request.param == "memory":
+        store = InMemoryRefreshTokenStore()
+    elif request.param == "sqlite":
+        store = SQLiteRefreshTokenStore(":memory:")
+    else:
+        store = RedisRefreshTokenStore(_FakeRedis())
+    return RefreshTokenManager(store=store, expiry=60)
+
+class TestRefreshTokenRotation:
+    def test_rotation_issues_new_token(self, refresh_manager):
+        """Test refresh token rotation within a family"""
+        token = refresh_manager.issue("user123", {"role": "admin"})
+        successor, record = refresh_manager.rotate(token)
+        assert successor != token
+        assert record.user_id == "user123"
+        assert record.metadata == {"role": "admin"}
+        _, next_record = refresh_manager.rotate(successor)
+        assert next_record.family_id == record.family_id
+
+    def test_reuse_revokes_family(self, refresh_manager):
+        """Test replay of a rotated token revokes the whole family"""
+        token = refresh_manager.issue("user123")
+        successor, _ = refresh_manager.rotate(token)
+        with pytest.raises(TokenReuseDetected):
+            refresh_manager.rotate(token)
+        with pytest.raises(InvalidTokenError):
+            refresh_manager.rotate(successor)
+
+    def test_incomplete_store_rejected(self):
+        """Test a backend missing required methods fails at construction"""
+        class PartialStore(RefreshTokenStore):
+            def save(self, record):
+                pass
+
+        with pytest.raises(TypeError):
+            PartialStore()
+
+    def test_expired_refresh_token(self, refresh_manager, mocker):
+        """Test refresh tokens expire after their TTL"""
+        token = refresh_manager.issue("user123")
+        mocker.patch("time.time", return_value=time.time() + 120)
+        with pytest.raises(InvalidTokenError):
+            refresh_manager.rotate(token)
+
+    def test_sqlite_purges_expired_on_save(self, mocker):
+        """Test the SQLite store drops expired rows as new tokens are saved"""
+        store = SQLiteRefreshTokenStore(":memory:", purge_interval=2)
+        manager = RefreshTokenManager(store=store, expiry=60)
+        manager.issue("user123")
+        manager.issue("user456")
+        mocker.patch("time.time", return_value=time.time() + 120)
+        manager.issue("user789")
+        manager.issue("user000")
+        assert store._conn.execute("SELECT COUNT(*) FROM refresh_tokens").fetchone()[0] == 2
+
+class TestFastTokenVerifier:
+    def test_roundtrip_matches_pyjwt_encoding(self):
+        """Test fast path accepts tokens in the library's own format"""
+        import jwt
+        verifier = FastTokenVerifier("test-secret-key-1234")
+        token = jwt.encode(
+            {"sub": "user123", "exp": int(time.time()) + 60, "iss": "authnexus"},
+            "test-secret-key-1234",
+            algorithm="HS256"
+        )
+        assert verifier.verify(token)["sub"] == "user123"
+
+    def test_rejects_forged_and_foreign_tokens(self):
+        """Test forged signatures, foreign headers and expired claims"""
+        import jwt
+        verifier = FastTokenVerifier("test-secret-key-1234")
+        claims = {"sub": "user123", "exp": int(time.time()) + 60, "iss": "authnexus"}
+        assert verifier.verify(jwt.encode(claims, "wrong-secret", algorithm="HS256")) is None
+        assert verifier.verify(jwt.encode(claims, "test-secret-key-1234", algorithm="HS512")) is None
+        assert verifier.verify("not.a.token") is None
+        assert verifier.verify(None) is None
+        assert verifier.verify(b"not.a.token") is None
+        expired = dict(claims, exp=int(time.time()) - 1)
+        assert verifier.verify(jwt.encode(expired, "test-secret-key-1234", algorithm="HS256")) is None